@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+VulnLib Review Aggregates
+Per-book review count, rating sum and 1-5 histogram kept on the book row
+
+Usage:
+    python aggregates.py    # rebuild every book's aggregates from the review table
+"""
+
+from sqlalchemy import text, update
+
+from models import db, Book
+
+RATING_BUCKETS = (1, 2, 3, 4, 5)
+
+def record_review(book_id, rating):
+    """Fold one new review into its book's aggregates, inside the caller's transaction"""
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        rating = None
+
+    values = {'review_count': Book.review_count + 1}
+    if rating is not None:
+        values['rating_sum'] = Book.rating_sum + rating
+    if rating in RATING_BUCKETS:
+        bucket = getattr(Book, f'rating_{rating}')
+        values[bucket.key] = bucket + 1
+
+    # Relative UPDATE, so concurrent reviews of the same book never lose a count
+    db.session.execute(
+        update(Book).where(Book.id == book_id).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+def rebuild_review_aggregates(connection=None):
+    """Recompute every book's aggregates from the review table in one statement"""
+    buckets = ',\n'.join(
+        f"rating_{n} = (SELECT COUNT(*) FROM review r WHERE r.book_id = book.id AND r.rating = {n})"
+        for n in RATING_BUCKETS
+    )
+    statement = text(f"""
+        UPDATE book SET
+            review_count = (SELECT COUNT(*) FROM review r WHERE r.book_id = book.id),
+            rating_sum = (SELECT COALESCE(SUM(r.rating), 0) FROM review r WHERE r.book_id = book.id),
+            {buckets}
+    """)
+
+    if connection is not None:
+        connection.execute(statement)
+    else:
+        with db.engine.begin() as own_connection:
+            own_connection.execute(statement)
+
+def review_summary(book, fields=None):
+    """Aggregate fields exposed on book payloads
+
+    With `fields`, only those summary fields are computed, so `book` may be a
+    row carrying just the columns they need.
+    """
+    summary = {}
+    if fields is None or 'review_count' in fields or 'average_rating' in fields:
+        summary['review_count'] = book.review_count or 0
+    if fields is None or 'average_rating' in fields:
+        count = summary['review_count']
+        summary['average_rating'] = round(book.rating_sum / count, 2) if count else None
+    if fields is None or 'rating_histogram' in fields:
+        summary['rating_histogram'] = {str(n): getattr(book, f'rating_{n}') or 0 for n in RATING_BUCKETS}
+    if fields is not None:
+        summary = {f: summary[f] for f in fields if f in summary}
+    return summary
+
+def main():
+    from app import app
+
+    with app.app_context():
+        rebuild_review_aggregates()
+    print("✅ Rebuilt review aggregates")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash, make_response
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash, make_response, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
@@ -7,12 +7,13 @@ import os
 import json
 import requests
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import csv
 from io import StringIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import time
+import queue
 
 # Import seeder functions for database reset
 try:
@@ -27,11 +28,32 @@ app.config['SECRET_KEY'] = 'vuln-library-secret-key-2024'  # VULN: Weak secret k
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///vulnlib.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['AUDIT_ARCHIVE_FOLDER'] = 'instance/audit_archive'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+# Raise when one request repeats a statement more than N times (N+1 detector), unset to disable
+app.config['QUERY_REPEAT_LIMIT'] = int(os.environ.get('QUERY_REPEAT_LIMIT', 0)) or None
+# Seconds between in-process overdue sweeps when run via `python app.py`, 0 to disable
+app.config['OVERDUE_SWEEP_INTERVAL'] = int(os.environ.get('OVERDUE_SWEEP_INTERVAL', 300))
 
-from models import db, User, Book, Loan, Review, Fine, Wishlist, AuditLog, SystemConfig
+from models import db, User, Book, Loan, Review, Fine, Wishlist, AuditLog, AuditLogRollup, SystemConfig
+from search_index import init_search_index, search_books, build_match_expression
+from instrumentation import init_query_stats
+from migrations import run_migrations
+from audit import audit_sink
+from retention import run_retention
+from overdue import sweep_overdue, settle_late_fines, start_sweeper
+from cache import CatalogCache, VersionCounters
+from aggregates import record_review, review_summary
+from suggest import suggest_index
+from catalog import catalog_snapshot, load_records, top_facets
+from availability import booking_schedules, fit_bookings, starts_by
+from circulation import BULK_ACTIONS, take_copies, return_copies, transition_loan, bulk_loan_action
+from loaders import usernames, books as load_books, book_titles_and_authors
+from pagination import InvalidCursor, encode_cursor, decode_cursor, keyset_page, cached_count, cached_value, invalidate_counts
 
 db.init_app(app)
+init_query_stats(app)
+audit_sink.init_app(app)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -55,7 +77,8 @@ def log_action(action, resource_type=None, resource_id=None, details=None):
     else:
         user_id = None
     
-    log = AuditLog(
+    # Buffered: written in batches by the audit sink's background thread
+    audit_sink.record(
         user_id=user_id,
         action=action,
         resource_type=resource_type,
@@ -63,8 +86,118 @@ def log_action(action, resource_type=None, resource_id=None, details=None):
         details=details,
         ip_address=request.remote_addr
     )
-    db.session.add(log)
-    db.session.commit()
+
+catalog_cache = CatalogCache(maxsize=512)
+versions = VersionCounters()
+
+def catalog_changed(*book_ids, added=()):
+    # Call after committing any Book change: the ids of changed books, or (added=) the ids of new ones.
+    # The snapshot is refreshed before any eviction, so a reader that starts after an
+    # eviction (and may cache what it builds) never reads the old snapshot.
+    # One chunked reload for every changed book
+    catalog_snapshot.refresh(book_ids)
+    if added:
+        # One chunked load feeds both in-memory indexes
+        records = catalog_snapshot.refresh(added)
+        if records is None:
+            records = load_records(added)
+        suggest_index.add_books(records)
+    for book_id in book_ids:
+        catalog_cache.invalidate_book(book_id)
+        versions.bump(('book', book_id))
+    if added or not book_ids:
+        invalidate_counts('books')
+        catalog_cache.invalidate_kind('books')
+
+def loans_changed(*book_ids):
+    # Call after committing a change to when copies are out: approve, return or extend
+    booking_schedules.invalidate(book_ids)
+
+def reservations_started(book_ids):
+    # The overdue sweeper handed out reserved copies: the counter moved and each
+    # schedule's picture of which copies are out is stale
+    catalog_changed(*book_ids)
+    loans_changed(*book_ids)
+
+def reset_read_caches():
+    # After bulk rewrites: drop every cached body, cached total and outstanding ETag
+    catalog_cache.clear()
+    invalidate_counts()
+    versions.reset()
+    suggest_index.reset()
+    catalog_snapshot.reset()
+    booking_schedules.reset()
+
+def not_modified(etag):
+    # Answer a matching If-None-Match before any row is loaded or serialized
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def cached_json(body):
+    return app.response_class(body, mimetype='application/json')
+
+def cache_json(key, payload, book_ids, generation):
+    # generation: catalog_cache.generation() taken before reading; a body built across an eviction is not kept
+    response = jsonify(payload)
+    catalog_cache.put(key, response.get_data(), book_ids, generation)
+    return response
+
+def loans_with_names():
+    # One joined SELECT instead of lazy loan.book / loan.user loads per row
+    return (db.session.query(Loan, Book.title, User.username)
+            .outerjoin(Book, Loan.book_id == Book.id)
+            .outerjoin(User, Loan.user_id == User.id))
+
+LIST_PAGE_DEFAULT = 50
+LIST_PAGE_MAX = 200
+NDJSON = 'application/x-ndjson'
+STREAM_BATCH = 500
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+def list_response(name, query, columns, types, serialize, descending=False, entity=lambda row: row):
+    # Three shapes for one list endpoint:
+    #   Accept: application/x-ndjson -> one JSON object per line, streamed with yield_per
+    #   ?limit= and/or ?cursor=      -> one keyset page plus next_cursor
+    #   neither                      -> the original {name: [...]} array
+    if wants_ndjson():
+        order = [c.desc() for c in columns] if descending else list(columns)
+        rows = query.order_by(None).order_by(*order).yield_per(STREAM_BATCH)
+        
+        def generate():
+            for row in rows:
+                yield json.dumps(serialize(row)) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype=NDJSON)
+    
+    if 'limit' in request.args or 'cursor' in request.args:
+        cursor = request.args.get('cursor')
+        try:
+            limit = min(max(int(request.args.get('limit', LIST_PAGE_DEFAULT)), 1), LIST_PAGE_MAX)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid limit'}), 400
+        try:
+            after = decode_cursor(cursor, types) if cursor else None
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        
+        rows, last = keyset_page(query, columns, after, limit, descending)
+        return jsonify({
+            name: [serialize(row) for row in rows],
+            'next_cursor': encode_cursor([getattr(entity(last), c.key) for c in columns]) if last else None
+        })
+    
+    return jsonify({name: [serialize(row) for row in query.all()]})
 
 # Routes
 @app.route('/')
@@ -135,6 +268,7 @@ def register():
     )
     db.session.add(user)
     db.session.commit()
+    versions.bump('user')
     
     log_action('register', 'user', user.id)
     return jsonify({'success': True, 'message': 'Account created successfully'})
@@ -163,23 +297,79 @@ def api_logout():
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
 # Book API endpoints
-@app.route('/api/books')
-def api_books():
-    search = request.args.get('search', '')
-    category = request.args.get('category', '')
-    author = request.args.get('author', '')
-    page = int(request.args.get('page', 1))
-    per_page = 12
-    
+BOOK_CURSOR_SORTS = {
+    # sort name -> (seek columns, cursor value types, descending)
+    'newest': ((Book.created_at, Book.id), (datetime, str), True),
+    'title': ((Book.title, Book.id), (str, str), False),
+}
+
+# Sparse fieldsets: public field name -> columns needed to render it
+BOOK_LIST_FIELDS = {
+    'id': (Book.id,),
+    'title': (Book.title,),
+    'author': (Book.author,),
+    'category': (Book.category,),
+    'description': (Book.description,),
+    'cover_url': (Book.cover_url,),
+    'year_published': (Book.year_published,),
+    'available_copies': (Book.available_copies,),
+    'total_copies': (Book.total_copies,),
+    'tags': (Book.tags,),
+    'review_count': (Book.review_count,),
+    'average_rating': (Book.review_count, Book.rating_sum),
+    'rating_histogram': (Book.rating_1, Book.rating_2, Book.rating_3, Book.rating_4, Book.rating_5),
+}
+
+def parse_book_fields(value):
+    # None means "full objects"; otherwise the requested names, id always first
+    if not value:
+        return None
+    fields = ['id'] + [f.strip() for f in value.split(',') if f.strip() and f.strip() != 'id']
+    unknown = [f for f in fields if f not in BOOK_LIST_FIELDS]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return tuple(dict.fromkeys(fields))
+
+def book_columns(fields, extra=()):
+    columns = []
+    for field in fields:
+        columns.extend(BOOK_LIST_FIELDS[field])
+    columns.extend(extra)
+    return list(dict.fromkeys(columns))
+
+def book_list_item(book, fields=None):
+    if fields is not None:
+        summary = review_summary(book, fields)
+        return {f: summary[f] if f in summary else getattr(book, f) for f in fields}
+    return {
+        'id': book.id,
+        'title': book.title,
+        'author': book.author,
+        'category': book.category,
+        'description': book.description,
+        'cover_url': book.cover_url,
+        'year_published': book.year_published,
+        'available_copies': book.available_copies,
+        'total_copies': book.total_copies,
+        'tags': book.tags,
+        **review_summary(book)
+    }
+
+def filter_books(search, category, author):
     query = Book.query
     
     if search:
-        # VULN: Potential for SQL injection in search
-        query = query.filter(
-            Book.title.contains(search) |
-            Book.author.contains(search) |
-            Book.description.contains(search)
-        )
+        # Ranked prefix search against the FTS5 index, LIKE scan as fallback
+        ranked = search_books(query, search)
+        if ranked is not None:
+            query = ranked
+        else:
+            # VULN: Potential for SQL injection in search
+            query = query.filter(
+                Book.title.contains(search) |
+                Book.author.contains(search) |
+                Book.description.contains(search)
+            )
     
     if category:
         query = query.filter(Book.category == category)
@@ -187,31 +377,145 @@ def api_books():
     if author:
         query = query.filter(Book.author.contains(author))
     
+    return query
+
+@app.route('/api/books')
+def api_books():
+    search = request.args.get('search', '')
+    category = request.args.get('category', '')
+    author = request.args.get('author', '')
+    page = int(request.args.get('page', 1))
+    per_page = 12
+    include_total = request.args.get('include_total') in ('1', 'true')
+    count_only = request.args.get('count_only') in ('1', 'true')
+    try:
+        fields = parse_book_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Unknown fields: {e}'}), 400
+    
+    # Normalized cache key: FTS terms are case-insensitive, unknown params are ignored
+    search_key = build_match_expression(search).lower() or search
+    if count_only:
+        cache_key = ('books', search_key, category, author, 'count')
+    elif 'cursor' in request.args:
+        cache_key = ('books', search_key, category, author, fields, 'cursor',
+                     request.args.get('cursor'), request.args.get('sort', 'newest'), include_total)
+    else:
+        cache_key = ('books', search_key, category, author, fields, 'page', page)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached_json(cached)
+    generation = catalog_cache.generation()
+    
+    cursor_mode = 'cursor' in request.args
+    if cursor_mode:
+        sort = request.args.get('sort', 'newest')
+        if sort not in BOOK_CURSOR_SORTS:
+            return jsonify({'success': False, 'message': 'Invalid sort'}), 400
+        columns, types, descending = BOOK_CURSOR_SORTS[sort]
+        
+        cursor = request.args.get('cursor')
+        try:
+            after = decode_cursor(cursor, types) if cursor else None
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    if not search:
+        # Unsearched listings are answered from the in-memory catalog snapshot
+        snapshot = catalog_snapshot.current()
+        if count_only:
+            return cache_json(cache_key, {'total': snapshot.count(category, author)}, [], generation)
+        
+        if cursor_mode:
+            books, last = snapshot.seek([c.key for c in columns], after, per_page, descending, category, author)
+            result = {
+                'books': [book_list_item(book, fields) for book in books],
+                'next_cursor': encode_cursor([getattr(last, c.key) for c in columns]) if last else None,
+                'per_page': per_page
+            }
+            if include_total:
+                result['total'] = snapshot.count(category, author)
+            return cache_json(cache_key, result, [book.id for book in books], generation)
+        
+        books, total = snapshot.page(page, per_page, category, author)
+        return cache_json(cache_key, {
+            'books': [book_list_item(book, fields) for book in books],
+            'total': total,
+            'page': page,
+            'pages': -(-total // per_page)
+        }, [book.id for book in books], generation)
+    
+    query = filter_books(search, category, author)
+    
+    if count_only:
+        return cache_json(cache_key, {'total': cached_count(('books', search, category, author), query)}, [], generation)
+    
+    # Keyset mode: ?cursor= (empty for the first page) seeks instead of OFFSET
+    if cursor_mode:
+        if fields is not None:
+            # Column-only SELECT: no ORM objects, seek columns added for the cursor
+            query = query.with_entities(*book_columns(fields, columns))
+        books, last = keyset_page(query, columns, after, per_page, descending)
+        
+        result = {
+            'books': [book_list_item(book, fields) for book in books],
+            'next_cursor': encode_cursor([getattr(last, c.key) for c in columns]) if last else None,
+            'per_page': per_page
+        }
+        if include_total:
+            result['total'] = cached_count(('books', search, category, author), query)
+        return cache_json(cache_key, result, [book.id for book in books], generation)
+    
+    if fields is not None:
+        query = query.with_entities(*book_columns(fields))
     books = query.paginate(page=page, per_page=per_page, error_out=False)
     
-    return jsonify({
-        'books': [{
-            'id': book.id,
-            'title': book.title,
-            'author': book.author,
-            'category': book.category,
-            'description': book.description,
-            'cover_url': book.cover_url,
-            'year_published': book.year_published,
-            'available_copies': book.available_copies,
-            'total_copies': book.total_copies,
-            'tags': book.tags
-        } for book in books.items],
+    return cache_json(cache_key, {
+        'books': [book_list_item(book, fields) for book in books.items],
         'total': books.total,
         'page': page,
         'pages': books.pages
-    })
+    }, [book.id for book in books.items], generation)
 
-@app.route('/api/books/<book_id>')
-def api_book_detail(book_id):
-    book = Book.query.get_or_404(book_id)
+FACET_LIMIT_MAX = 200
+
+@app.route('/api/books/facets')
+def api_book_facets():
+    search = request.args.get('search', '')
+    category = request.args.get('category', '')
+    author = request.args.get('author', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), FACET_LIMIT_MAX)
+    except ValueError:
+        limit = 50
+    
+    if not search:
+        # Unfiltered counts are maintained on write; filters count the matching snapshot records
+        return jsonify({'facets': top_facets(catalog_snapshot.current().facet_counts(category, author), limit)})
+    
+    query = filter_books(search, category, author).order_by(None)
+    availability = db.case((Book.available_copies > 0, 'available'), else_='unavailable')
+    counts = {}
+    for facet, column in (('category', Book.category), ('author', Book.author),
+                          ('year', Book.year_published), ('availability', availability)):
+        rows = query.with_entities(column, db.func.count()).group_by(column).all()
+        counts[facet] = dict(rows)
+    
+    return jsonify({'facets': top_facets(counts, limit)})
+
+@app.route('/api/books/suggest')
+def api_book_suggest():
+    # Typeahead: served from the in-memory prefix index, never from the database
+    prefix = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
     
-    return jsonify({
+    return jsonify({'suggestions': suggest_index.suggest(prefix, limit)})
+
+def book_detail_item(book):
+    return {
         'id': book.id,
         'title': book.title,
         'author': book.author,
@@ -223,24 +527,126 @@ def api_book_detail(book_id):
         'available_copies': book.available_copies,
         'total_copies': book.total_copies,
         'tags': book.tags,
-        'created_at': book.created_at.isoformat()
+        'created_at': book.created_at.isoformat(),
+        **review_summary(book)
+    }
+
+@app.route('/api/books/<book_id>')
+def api_book_detail(book_id):
+    etag = versions.etag(('book', book_id))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    cache_key = ('book', book_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return with_etag(cached_json(cached), etag)
+    generation = catalog_cache.generation()
+    
+    book = Book.query.get_or_404(book_id)
+    
+    return with_etag(cache_json(cache_key, book_detail_item(book), [book.id], generation), etag)
+
+BOOK_BATCH_MAX = 500
+
+@app.route('/api/books/batch', methods=['GET', 'POST'])
+def api_books_batch():
+    # GET ?ids=a,b,c for short lists; POST {"ids": [...]} when the query string would be too long
+    if request.method == 'POST':
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(ids, list):
+            return jsonify({'success': False, 'message': 'ids must be a list'}), 400
+        ids = [str(i).strip() for i in ids]
+    else:
+        ids = request.args.get('ids', '').split(',')
+    ids = list(dict.fromkeys(i.strip() for i in ids if i and i.strip()))
+    
+    if len(ids) > BOOK_BATCH_MAX:
+        return jsonify({'success': False, 'message': f'At most {BOOK_BATCH_MAX} ids per request'}), 400
+    
+    found = load_books(ids)
+    
+    return jsonify({
+        'books': [book_detail_item(found[i]) for i in ids if i in found],
+        'missing': [i for i in ids if i not in found]
+    })
+
+AVAILABILITY_DEFAULT_DAYS = 14
+
+def parse_loan_date(value):
+    # Stored timestamps are naive UTC; a browser's toISOString() carries a Z
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@app.route('/api/books/<book_id>/availability')
+def api_book_availability(book_id):
+    # ?from=&to= (ISO dates); defaults to the next two weeks, the usual loan period
+    try:
+        start = parse_loan_date(request.args['from']) if request.args.get('from') else datetime.utcnow()
+        end = (parse_loan_date(request.args['to']) if request.args.get('to')
+               else start + timedelta(days=AVAILABILITY_DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+    if end <= start:
+        return jsonify({'success': False, 'message': 'to must be after from'}), 400
+    
+    book = Book.query.get_or_404(book_id)
+    schedule = booking_schedules.get(book.id)
+    booked = schedule.peak(start, end)
+    free = schedule.free(book.total_copies, book.available_copies, start, end)
+    
+    return jsonify({
+        'book_id': book.id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'total_copies': book.total_copies,
+        'booked_copies': booked,
+        'free_copies': free,
+        'available': free > 0
     })
 
 # Review endpoints
+REVIEW_PAGE_MAX = 50
+
 @app.route('/api/books/<book_id>/reviews')
 def api_book_reviews(book_id):
-    reviews = Review.query.filter_by(book_id=book_id).all()
+    # Usernames are part of the body, so renames elsewhere must change the tag too
+    etag = versions.etag(('reviews', book_id), 'user')
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    query = Review.query.filter_by(book_id=book_id)
+    
+    # Paginated mode (?limit= and/or ?cursor=): newest first, seeking on (created_at, id)
+    next_cursor = None
+    if 'limit' in request.args or 'cursor' in request.args:
+        cursor = request.args.get('cursor')
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), REVIEW_PAGE_MAX)
+            after = decode_cursor(cursor, (datetime, str)) if cursor else None
+        except (ValueError, InvalidCursor):
+            return jsonify({'success': False, 'message': 'Invalid pagination parameters'}), 400
+        reviews, last = keyset_page(query, (Review.created_at, Review.id), after, limit, descending=True)
+        next_cursor = encode_cursor([last.created_at, last.id]) if last else None
+    else:
+        reviews = query.all()
+    names = usernames(review.user_id for review in reviews)
     
-    return jsonify({
+    return with_etag(jsonify({
+        'next_cursor': next_cursor,
         'reviews': [{
             'id': review.id,
             'user_id': review.user_id,
-            'username': review.user.username,
+            'username': names.get(review.user_id, 'Unknown User'),
             'rating': review.rating,
             'comment': review.comment,
             'created_at': review.created_at.isoformat()
         } for review in reviews]
-    })
+    }), etag)
 
 @app.route('/api/books/<book_id>/reviews', methods=['POST'])
 def api_create_review(book_id):
@@ -259,7 +665,10 @@ def api_create_review(book_id):
     )
     
     db.session.add(review)
+    record_review(book_id, rating)  # same transaction as the insert
     db.session.commit()
+    versions.bump(('reviews', book_id))
+    catalog_changed(book_id)
     
     return jsonify({'success': True, 'message': 'Review added successfully', 'review_id': review.id})
 
@@ -267,21 +676,101 @@ def api_create_review(book_id):
 @app.route('/api/users/<user_id>/loans')
 def api_user_loans(user_id):
     # VULN: IDOR - No check if current user matches user_id
-    loans = Loan.query.filter_by(user_id=user_id).all()
+    loans = loans_with_names().filter(Loan.user_id == user_id)
     
-    return jsonify({
-        'loans': [{
-            'id': loan.id,
-            'book_id': loan.book_id,
-            'book_title': loan.book.title,
-            'requested_at': loan.requested_at.isoformat(),
-            'approved_at': loan.approved_at.isoformat() if loan.approved_at else None,
-            'due_date': loan.due_date.isoformat() if loan.due_date else None,
-            'returned_at': loan.returned_at.isoformat() if loan.returned_at else None,
-            'status': loan.status,
-            'notes': loan.notes
-        } for loan in loans]
-    })
+    return list_response('loans', loans, (Loan.requested_at, Loan.id), (datetime, str),
+                         lambda row: user_loan_item(row[0], row[1]), descending=True, entity=lambda row: row[0])
+
+def user_loan_item(loan, book_title):
+    return {
+        'id': loan.id,
+        'book_id': loan.book_id,
+        'book_title': book_title,
+        'requested_at': loan.requested_at.isoformat(),
+        'approved_at': loan.approved_at.isoformat() if loan.approved_at else None,
+        'from_date': loan.from_date.isoformat() if loan.from_date else None,
+        'due_date': loan.due_date.isoformat() if loan.due_date else None,
+        'returned_at': loan.returned_at.isoformat() if loan.returned_at else None,
+        'status': loan.status,
+        'notes': loan.notes
+    }
+
+def fine_item(fine):
+    return {
+        'id': fine.id,
+        'amount': fine.amount,
+        'reason': fine.reason,
+        'status': fine.status,
+        'created_at': fine.created_at.isoformat(),
+        'paid_at': fine.paid_at.isoformat() if fine.paid_at else None
+    }
+
+def wishlist_items(user_id):
+    # Two queries however long the list: the items, then their books in one IN lookup
+    items = Wishlist.query.filter_by(user_id=user_id).all()
+    books = book_titles_and_authors(item.book_id for item in items)
+    
+    return [{
+        'id': item.id,
+        'book_id': item.book_id,
+        'book_title': books.get(item.book_id, (None, None))[0],
+        'book_author': books.get(item.book_id, (None, None))[1],
+        'created_at': item.created_at.isoformat()
+    } for item in items]
+
+SUMMARY_SECTIONS = ('active_loans', 'recent_loans', 'loans', 'fines', 'wishlist')
+SUMMARY_DEFAULT = ('active_loans', 'wishlist')
+RECENT_LOANS = 5
+
+@app.route('/api/users/<user_id>/summary')
+def api_user_summary(user_id):
+    # VULN: IDOR - No authorization check
+    include = request.args.get('include')
+    sections = [s.strip() for s in include.split(',') if s.strip()] if include is not None else SUMMARY_DEFAULT
+    unknown = [s for s in sections if s not in SUMMARY_SECTIONS]
+    if unknown:
+        return jsonify({'success': False, 'message': f"Unknown sections: {', '.join(unknown)}"}), 400
+    
+    # Every count in one statement of scalar subqueries
+    active = db.and_(Loan.status.in_(['approved', 'overdue']), Loan.returned_at.is_(None))
+    unpaid = db.and_(Fine.user_id == user_id, Fine.status == 'unpaid')
+    def count(model, *where):
+        return db.select(db.func.count()).select_from(model).where(*where).scalar_subquery()
+    totals = db.session.execute(db.select(
+        count(Loan, Loan.user_id == user_id),
+        count(Loan, Loan.user_id == user_id, active),
+        count(Loan, Loan.user_id == user_id, Loan.status == 'pending'),
+        count(Fine, unpaid),
+        db.select(db.func.coalesce(db.func.sum(Fine.amount), 0)).where(unpaid).scalar_subquery(),
+        count(Wishlist, Wishlist.user_id == user_id),
+    )).one()
+    
+    result = {
+        'counts': {
+            'loans': totals[0],
+            'active_loans': totals[1],
+            'pending_loans': totals[2],
+            'unpaid_fines': totals[3],
+            'wishlist': totals[5]
+        },
+        'outstanding_fines': totals[4]
+    }
+    
+    user_loans = loans_with_names().filter(Loan.user_id == user_id)
+    if 'loans' in sections:
+        result['loans'] = [user_loan_item(loan, title) for loan, title, _ in user_loans.all()]
+    if 'active_loans' in sections:
+        rows = user_loans.filter(active).order_by(Loan.due_date).all()
+        result['active_loans'] = [user_loan_item(loan, title) for loan, title, _ in rows]
+    if 'recent_loans' in sections:
+        rows = user_loans.order_by(Loan.requested_at.desc()).limit(RECENT_LOANS).all()
+        result['recent_loans'] = [user_loan_item(loan, title) for loan, title, _ in rows]
+    if 'fines' in sections:
+        result['fines'] = [fine_item(fine) for fine in Fine.query.filter_by(user_id=user_id).all()]
+    if 'wishlist' in sections:
+        result['wishlist'] = wishlist_items(user_id)
+    
+    return jsonify(result)
 
 @app.route('/api/loans', methods=['POST'])
 @login_required
@@ -289,12 +778,20 @@ def api_create_loan():
     data = request.get_json()
     
     book_id = data.get('book_id')
-    from_date = datetime.fromisoformat(data.get('from_date'))
-    to_date = datetime.fromisoformat(data.get('to_date'))
+    from_date = parse_loan_date(data.get('from_date'))
+    to_date = parse_loan_date(data.get('to_date'))
+    if to_date <= from_date:
+        return jsonify({'success': False, 'message': 'to_date must be after from_date'}), 400
+    
+    # Forward-booking check against the loans already holding copies for those dates
+    book = Book.query.get_or_404(book_id)
+    if not booking_schedules.get(book.id).free(book.total_copies, book.available_copies, from_date, to_date):
+        return jsonify({'success': False, 'message': 'No copies free for those dates'}), 409
     
     loan = Loan(
         user_id=current_user.id,
         book_id=book_id,
+        from_date=from_date,
         due_date=to_date,
         status='pending'
     )
@@ -313,15 +810,25 @@ def api_approve_loan(loan_id):
     loan = Loan.query.get_or_404(loan_id)
     
     # VULN: No proper authorization check for approval
-    loan.status = 'approved'
-    loan.approved_at = datetime.utcnow()
+    # Status and availability change through conditional UPDATEs in one transaction
+    now = datetime.utcnow()
+    # A loan starting later is reserved; the overdue sweeper hands its copy out on from_date
+    starts_now = starts_by(loan, now)
+    if not transition_loan(loan.id, ('pending',), status='approved' if starts_now else 'reserved', approved_at=now):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Loan is not pending'}), 409
     
-    # Update book availability
-    book = Book.query.get(loan.book_id)
-    if book.available_copies > 0:
-        book.available_copies -= 1
+    if not fit_bookings([loan], now):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'No copies free for those dates'}), 409
+    
+    if starts_now and not take_copies(loan.book_id):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'No copies available'}), 409
     
     db.session.commit()
+    catalog_changed(loan.book_id)
+    loans_changed(loan.book_id)
     
     return jsonify({'success': True, 'message': 'Loan approved successfully'})
 
@@ -342,6 +849,7 @@ def api_extend_loan(loan_id):
     
     loan.due_date = loan.due_date + timedelta(days=extend_days)
     db.session.commit()
+    loans_changed(loan.book_id)
     
     return jsonify({'success': True, 'message': f'Loan extended by {extend_days} days'})
 
@@ -349,18 +857,9 @@ def api_extend_loan(loan_id):
 @app.route('/api/users/<user_id>/fines')
 def api_user_fines(user_id):
     # VULN: IDOR - No authorization check
-    fines = Fine.query.filter_by(user_id=user_id).all()
+    fines = Fine.query.filter_by(user_id=user_id)
     
-    return jsonify({
-        'fines': [{
-            'id': fine.id,
-            'amount': fine.amount,
-            'reason': fine.reason,
-            'status': fine.status,
-            'created_at': fine.created_at.isoformat(),
-            'paid_at': fine.paid_at.isoformat() if fine.paid_at else None
-        } for fine in fines]
-    })
+    return list_response('fines', fines, (Fine.created_at, Fine.id), (datetime, str), fine_item, descending=True)
 
 @app.route('/api/users/<user_id>/fines/pay', methods=['POST'])
 def api_pay_fine(user_id):
@@ -396,6 +895,7 @@ def api_update_user(user_id):
             setattr(user, key, value)  # VULN: Can set role, password_hash, etc.
     
     db.session.commit()
+    versions.bump('user')
     
     log_action('update_profile', 'user', user_id)
     return jsonify({'success': True, 'message': 'Profile updated successfully'})
@@ -404,17 +904,14 @@ def api_update_user(user_id):
 @app.route('/api/users/<user_id>/wishlist')
 def api_user_wishlist(user_id):
     # VULN: IDOR - No authorization check
-    wishlist_items = Wishlist.query.filter_by(user_id=user_id).all()
-    
-    return jsonify({
-        'wishlist': [{
-            'id': item.id,
-            'book_id': item.book_id,
-            'book_title': item.book.title,
-            'book_author': item.book.author,
-            'created_at': item.created_at.isoformat()
-        } for item in wishlist_items]
-    })
+    etag = versions.etag(('wishlist', user_id))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    return with_etag(jsonify({
+        'wishlist': wishlist_items(user_id)
+    }), etag)
 
 @app.route('/api/users/<user_id>/wishlist', methods=['POST'])
 @login_required
@@ -431,6 +928,7 @@ def api_add_to_wishlist(user_id):
     
     db.session.add(wishlist_item)
     db.session.commit()
+    versions.bump(('wishlist', user_id))
     
     return jsonify({'success': True, 'message': 'Added to wishlist'})
 
@@ -439,9 +937,11 @@ def api_add_to_wishlist(user_id):
 def api_remove_from_wishlist(user_id, item_id):
     # VULN: Can remove from any user's wishlist
     item = Wishlist.query.get_or_404(item_id)
+    owner_id = item.user_id
     
     db.session.delete(item)
     db.session.commit()
+    versions.bump(('wishlist', owner_id))
     
     return jsonify({'success': True, 'message': 'Removed from wishlist'})
 
@@ -483,10 +983,13 @@ def api_create_book():
     )
     
     db.session.add(book)
+    db.session.flush()
+    book_id = book.id
     db.session.commit()
+    catalog_changed(added=[book_id])
     
-    log_action('create_book', 'book', book.id)
-    return jsonify({'success': True, 'message': 'Book created successfully', 'book_id': book.id})
+    log_action('create_book', 'book', book_id)
+    return jsonify({'success': True, 'message': 'Book created successfully', 'book_id': book_id})
 
 @app.route('/api/books/import', methods=['POST'])
 def api_import_books():
@@ -505,7 +1008,7 @@ def api_import_books():
         content = file.read().decode('utf-8')
         csv_reader = csv.DictReader(StringIO(content))
         
-        imported_count = 0
+        imported = []
         for row in csv_reader:
             book = Book(
                 title=row.get('title'),
@@ -515,9 +1018,14 @@ def api_import_books():
                 description=row.get('description')
             )
             db.session.add(book)
-            imported_count += 1
+            imported.append(book)
         
+        # Ids are assigned at flush; reading them after the commit would reload every row
+        db.session.flush()
+        imported_ids = [book.id for book in imported]
         db.session.commit()
+        catalog_changed(added=imported_ids)
+        imported_count = len(imported_ids)
         
         # Store import log with notes (VULN: XSS in notes)
         log_action('import_books', 'book', None, f'Imported {imported_count} books. Notes: {notes}')
@@ -573,6 +1081,7 @@ def api_upload_avatar():
         # Update user avatar path in database
         current_user.avatar = f"/uploads/{filename}"
         db.session.commit()
+        versions.bump('user')
         
         log_action('upload_avatar', 'user', current_user.id, f'Uploaded avatar: {filename}')
         return jsonify({'success': True, 'message': 'Avatar uploaded successfully', 'filename': filename})
@@ -582,20 +1091,25 @@ def api_upload_avatar():
 @app.route('/api/loans/pending')
 def api_pending_loans():
     # VULN: Weak authorization - should check if user is librarian
-    pending_loans = Loan.query.filter_by(status='pending').all()
+    pending_loans = loans_with_names().filter(Loan.status == 'pending')
     
-    return jsonify({
-        'loans': [{
-            'id': loan.id,
-            'user_id': loan.user_id,
-            'username': loan.user.username,
-            'book_id': loan.book_id,
-            'book_title': loan.book.title,
-            'requested_at': loan.requested_at.isoformat(),
-            'due_date': loan.due_date.isoformat() if loan.due_date else None,
-            'notes': loan.notes
-        } for loan in pending_loans]
-    })
+    # Oldest request first: the approval queue order
+    return list_response('loans', pending_loans, (Loan.requested_at, Loan.id), (datetime, str),
+                         pending_loan_item, entity=lambda row: row[0])
+
+def pending_loan_item(row):
+    loan, book_title, username = row
+    return {
+        'id': loan.id,
+        'user_id': loan.user_id,
+        'username': username,
+        'book_id': loan.book_id,
+        'book_title': book_title,
+        'requested_at': loan.requested_at.isoformat(),
+        'from_date': loan.from_date.isoformat() if loan.from_date else None,
+        'due_date': loan.due_date.isoformat() if loan.due_date else None,
+        'notes': loan.notes
+    }
 
 @app.route('/api/loans/all')
 def api_all_loans():
@@ -603,23 +1117,27 @@ def api_all_loans():
     if not current_user.is_authenticated or current_user.role not in ['librarian', 'admin']:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    all_loans = Loan.query.order_by(Loan.requested_at.desc()).all()
+    all_loans = loans_with_names().order_by(Loan.requested_at.desc(), Loan.id.desc())
     
-    return jsonify({
-        'loans': [{
-            'id': loan.id,
-            'user_id': loan.user_id,
-            'username': loan.user.username,
-            'book_id': loan.book_id,
-            'book_title': loan.book.title,
-            'requested_at': loan.requested_at.isoformat(),
-            'approved_at': loan.approved_at.isoformat() if loan.approved_at else None,
-            'due_date': loan.due_date.isoformat() if loan.due_date else None,
-            'returned_at': loan.returned_at.isoformat() if loan.returned_at else None,
-            'status': loan.status,
-            'notes': loan.notes
-        } for loan in all_loans]
-    })
+    return list_response('loans', all_loans, (Loan.requested_at, Loan.id), (datetime, str),
+                         managed_loan_item, descending=True, entity=lambda row: row[0])
+
+def managed_loan_item(row):
+    loan, book_title, username = row
+    return {
+        'id': loan.id,
+        'user_id': loan.user_id,
+        'username': username,
+        'book_id': loan.book_id,
+        'book_title': book_title,
+        'requested_at': loan.requested_at.isoformat(),
+        'approved_at': loan.approved_at.isoformat() if loan.approved_at else None,
+        'from_date': loan.from_date.isoformat() if loan.from_date else None,
+        'due_date': loan.due_date.isoformat() if loan.due_date else None,
+        'returned_at': loan.returned_at.isoformat() if loan.returned_at else None,
+        'status': loan.status,
+        'notes': loan.notes
+    }
 
 @app.route('/api/loans/<loan_id>/return', methods=['PUT'])
 def api_return_loan(loan_id):
@@ -631,35 +1149,72 @@ def api_return_loan(loan_id):
     # VULN: Client can manipulate return date for fine calculation
     return_date_str = data.get('return_date')
     if return_date_str:
-        return_date = datetime.fromisoformat(return_date_str)
+        try:
+            return_date = parse_loan_date(return_date_str)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid return_date'}), 400
     else:
         return_date = datetime.utcnow()
     
-    loan.returned_at = return_date
-    loan.status = 'returned'
+    if not transition_loan(loan.id, ('approved', 'overdue'), status='returned', returned_at=return_date):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Loan is not checked out'}), 409
     
     # Update book availability
-    book = Book.query.get(loan.book_id)
-    book.available_copies += 1
+    return_copies(loan.book_id)
     
     # Calculate fine based on client-provided return date (VULN: Business logic flaw)
-    if return_date > loan.due_date:
-        days_late = (return_date - loan.due_date).days
-        fine_amount = days_late * 1.0  # $1 per day
-        
-        fine = Fine(
-            user_id=loan.user_id,
-            loan_id=loan.id,
-            amount=fine_amount,
-            reason=f'Late return: {days_late} days',
-            status='unpaid'
-        )
-        db.session.add(fine)
+    settle_late_fines([loan], return_date)
     
     db.session.commit()
+    catalog_changed(loan.book_id)
+    loans_changed(loan.book_id)
     
     return jsonify({'success': True, 'message': 'Loan returned successfully'})
 
+BULK_LOAN_MAX = 500
+
+@app.route('/api/loans/bulk', methods=['POST'])
+def api_bulk_loans():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role not in ['librarian', 'admin']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    loan_ids = data.get('loan_ids')
+    if action not in BULK_ACTIONS:
+        return jsonify({'success': False, 'message': f"action must be one of {', '.join(BULK_ACTIONS)}"}), 400
+    if not isinstance(loan_ids, list) or not loan_ids:
+        return jsonify({'success': False, 'message': 'loan_ids must be a non-empty list'}), 400
+    loan_ids = list(dict.fromkeys(str(loan_id) for loan_id in loan_ids))
+    if len(loan_ids) > BULK_LOAN_MAX:
+        return jsonify({'success': False, 'message': f'At most {BULK_LOAN_MAX} loans per request'}), 400
+    
+    return_date = None
+    if action == 'return' and data.get('return_date'):
+        try:
+            return_date = parse_loan_date(data['return_date'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid return_date'}), 400
+    
+    results, books = bulk_loan_action(action, loan_ids, datetime.utcnow(), return_date)
+    db.session.commit()
+    if books:
+        catalog_changed(*books)
+        loans_changed(*books)
+    
+    succeeded = sum(1 for ok, _ in results.values() if ok)
+    log_action(f'bulk_{action}_loans', 'loan', None, f'{succeeded} of {len(loan_ids)} loans')
+    return jsonify({
+        'success': True,
+        'action': action,
+        'succeeded': succeeded,
+        'failed': len(loan_ids) - succeeded,
+        'results': [{'loan_id': loan_id, 'success': results[loan_id][0], 'message': results[loan_id][1]}
+                    for loan_id in loan_ids]
+    })
+
 @app.route('/api/loans/<loan_id>/slip')
 def api_loan_slip(loan_id):
     # VULN: No authorization check
@@ -693,17 +1248,30 @@ def api_admin_users():
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
     
     # VULN: Should check if user is admin, but this check can be bypassed
-    users = User.query.all()
+    users = User.query
+    columns = (User.created_at, User.id)
     
-    return jsonify({
-        'users': [{
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'role': user.role,
-            'created_at': user.created_at.isoformat()
-        } for user in users]
-    })
+    if wants_ndjson():
+        return list_response('users', users, columns, (datetime, str), admin_user_item)
+    
+    etag = versions.etag('user')
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    response = list_response('users', users, columns, (datetime, str), admin_user_item)
+    if isinstance(response, tuple):
+        return response  # 400 for a bad limit/cursor carries no ETag
+    return with_etag(response, etag)
+
+def admin_user_item(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'role': user.role,
+        'created_at': user.created_at.isoformat()
+    }
 
 @app.route('/api/admin/users', methods=['POST'])
 def api_admin_create_user():
@@ -722,6 +1290,7 @@ def api_admin_create_user():
     
     db.session.add(user)
     db.session.commit()
+    versions.bump('user')
     
     return jsonify({'success': True, 'message': 'User created successfully', 'user_id': user.id})
 
@@ -745,6 +1314,7 @@ def api_admin_update_user(user_id):
         user.password_hash = generate_password_hash(data['password'])
     
     db.session.commit()
+    versions.bump('user')
     
     return jsonify({'success': True, 'message': 'User updated successfully'})
 
@@ -757,28 +1327,281 @@ def api_admin_delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    versions.bump('user')
     
     return jsonify({'success': True, 'message': 'User deleted successfully'})
 
+AUDIT_TAIL_LIMIT = 100
+AUDIT_LOG_KEY = (AuditLog.created_at, AuditLog.id)  # keyset order of every audit log listing
+AUDIT_STREAM_HEARTBEAT = 15  # seconds between SSE keep-alive comments
+
+def audit_log_item(log):
+    return {
+        'id': log.id,
+        'user_id': log.user_id,
+        'action': log.action,
+        'resource_type': log.resource_type,
+        'resource_id': log.resource_id,
+        'details': log.details,  # VULN: Could contain XSS if log injection possible
+        'ip_address': log.ip_address,
+        'created_at': log.created_at.isoformat()
+    }
+
+def audit_logs_since(since, limit):
+    # Seek past (created_at, id) instead of re-reading the newest window every poll
+    after = decode_cursor(since, (datetime, str))
+    return keyset_page(AuditLog.query, AUDIT_LOG_KEY, after, limit)
+
 @app.route('/api/admin/logs')
 def api_admin_logs():
     # Proper access control
     if not current_user.is_authenticated or current_user.role != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    logs = AuditLog.query.order_by(AuditLog.created_at.desc()).limit(100).all()
+    since = request.args.get('since')
+    has_more = False
+    oldest = None
+    if since:
+        # Incremental tail: only entries newer than the client's cursor, oldest first
+        try:
+            logs, more = audit_logs_since(since, AUDIT_TAIL_LIMIT)
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        has_more = more is not None
+        newest = logs[-1] if logs else None
+        logs.reverse()
+    else:
+        logs, oldest = keyset_page(AuditLog.query, AUDIT_LOG_KEY, None, AUDIT_TAIL_LIMIT, descending=True)
+        newest = logs[0] if logs else None
     
     return jsonify({
-        'logs': [{
-            'id': log.id,
-            'user_id': log.user_id,
-            'action': log.action,
-            'resource_type': log.resource_type,
-            'resource_id': log.resource_id,
-            'details': log.details,  # VULN: Could contain XSS if log injection possible
-            'ip_address': log.ip_address,
-            'created_at': log.created_at.isoformat()
-        } for log in logs]
+        'logs': [audit_log_item(log) for log in logs],
+        'cursor': encode_cursor([newest.created_at, newest.id]) if newest else since,
+        'has_more': has_more,
+        # Continue into older history with /api/admin/logs/search?cursor=
+        'older_cursor': encode_cursor([oldest.created_at, oldest.id]) if oldest else None
+    })
+
+AUDIT_SEARCH_FILTERS = ('action', 'user_id', 'resource_type', 'ip_address')
+AUDIT_SEARCH_MAX_LIMIT = 200
+
+def parse_time_bound(value, end=False):
+    # A bare date as the upper bound means "through the end of that day"
+    bound = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return bound
+
+def audit_search_query(args):
+    # Equality filters plus an optional [from, to) window; ValueError on a bad time bound
+    query = AuditLog.query
+    for field in AUDIT_SEARCH_FILTERS:
+        value = args.get(field)
+        if value:
+            query = query.filter(getattr(AuditLog, field) == value)
+    if args.get('from'):
+        query = query.filter(AuditLog.created_at >= parse_time_bound(args['from']))
+    if args.get('to'):
+        query = query.filter(AuditLog.created_at < parse_time_bound(args['to'], end=True))
+    return query
+
+@app.route('/api/admin/logs/search')
+def api_admin_logs_search():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    try:
+        query = audit_search_query(request.args)
+        limit = min(max(int(request.args.get('limit', 50)), 1), AUDIT_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid filter value'}), 400
+    
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor, (datetime, str)) if cursor else None
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    # Newest first, seeking on (created_at, id) so deep pages cost the same as the first
+    logs, last = keyset_page(query, AUDIT_LOG_KEY, after, limit, descending=True)
+    
+    return jsonify({
+        'logs': [audit_log_item(log) for log in logs],
+        'next_cursor': encode_cursor([last.created_at, last.id]) if last else None
+    })
+
+@app.route('/api/admin/logs/stream')
+def api_admin_logs_stream():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    # Subscribe before reading the backlog so nothing written in between is lost
+    subscription = audit_sink.subscribe()
+    
+    since = request.args.get('since') or request.headers.get('Last-Event-ID')
+    first_page, more = [], None
+    if since:
+        try:
+            first_page, more = audit_logs_since(since, AUDIT_TAIL_LIMIT)
+        except InvalidCursor:
+            audit_sink.unsubscribe(subscription)
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    def backlog():
+        # Every row newer than the cursor, page by page, however far behind the client is
+        logs, last = first_page, more
+        while True:
+            for log in logs:
+                yield audit_log_item(log)
+            if last is None:
+                return
+            cursor = (last.created_at, last.id)
+            db.session.expunge_all()  # don't keep the whole backlog in the session
+            logs, last = keyset_page(AuditLog.query, AUDIT_LOG_KEY, cursor, AUDIT_TAIL_LIMIT)
+    
+    def event(item):
+        created_at = datetime.fromisoformat(item['created_at'])
+        return f"id: {encode_cursor([created_at, item['id']])}\ndata: {json.dumps(item)}\n\n"
+    
+    def generate():
+        try:
+            sent = set()
+            for item in backlog():
+                sent.add(item['id'])
+                yield event(item)
+            while True:
+                try:
+                    row = subscription.get(timeout=AUDIT_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if row['id'] in sent:
+                    continue
+                yield event(dict(row, created_at=row['created_at'].isoformat()))
+        finally:
+            audit_sink.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+DASHBOARD_STATS_TTL = 15  # seconds; dashboards tolerate slightly stale counts
+
+def dashboard_stats():
+    # Four aggregate statements regardless of table sizes
+    now = datetime.utcnow()
+    overdue = db.or_(
+        Loan.status == 'overdue',
+        db.and_(Loan.status == 'approved', Loan.returned_at.is_(None), Loan.due_date < now)
+    )
+    unpaid = Fine.status == 'unpaid'
+    
+    users_by_role = dict(db.session.query(User.role, db.func.count()).group_by(User.role).all())
+    loans_by_status = dict(db.session.query(Loan.status, db.func.count()).group_by(Loan.status).all())
+    books, copies, available = db.session.query(
+        db.func.count(), db.func.coalesce(db.func.sum(Book.total_copies), 0),
+        db.func.coalesce(db.func.sum(Book.available_copies), 0)
+    ).select_from(Book).one()
+    overdue_loans, unpaid_fines, unpaid_amount = db.session.execute(db.select(
+        db.select(db.func.count()).select_from(Loan).where(overdue).scalar_subquery(),
+        db.select(db.func.count()).select_from(Fine).where(unpaid).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(Fine.amount), 0)).where(unpaid).scalar_subquery(),
+    )).one()
+    
+    return {
+        'users': {'total': sum(users_by_role.values()), 'by_role': users_by_role},
+        'books': {'total': books, 'copies': copies, 'copies_available': available},
+        'loans': {'total': sum(loans_by_status.values()), 'by_status': loans_by_status, 'overdue': overdue_loans},
+        'fines': {'unpaid': unpaid_fines, 'unpaid_amount': unpaid_amount},
+        'generated_at': now.isoformat()
+    }
+
+@app.route('/api/dashboard/stats')
+def api_dashboard_stats():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role not in ['librarian', 'admin']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    stats = cached_value(('dashboard',), dashboard_stats, DASHBOARD_STATS_TTL)
+    return jsonify({'success': True, 'stats': stats})
+
+@app.route('/api/admin/audit/stats')
+def api_admin_audit_stats():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    return jsonify({'success': True, 'audit_sink': audit_sink.stats()})
+
+@app.route('/api/admin/cache/stats')
+def api_admin_cache_stats():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    return jsonify({'success': True, 'catalog_cache': catalog_cache.stats()})
+
+@app.route('/api/admin/loans/sweep-overdue', methods=['POST'])
+def api_admin_sweep_overdue():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role not in ['librarian', 'admin']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    summary = sweep_overdue(books_changed=reservations_started)
+    
+    log_action('sweep_overdue', 'system', None,
+               f"Marked {summary['marked_overdue']} loans overdue, {summary['fines_created']} new fines")
+    return jsonify({'success': True, 'sweep': summary})
+
+@app.route('/api/admin/audit/retention', methods=['POST'])
+def api_admin_audit_retention():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        days = int(data['days']) if data.get('days') is not None else None
+        max_batches = int(data.get('max_batches', 100))  # keep one request bounded; call again to continue
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'days and max_batches must be integers'}), 400
+    # A cutoff at or after now would archive rows written moments ago
+    if days is not None and days < 1:
+        return jsonify({'success': False, 'message': 'days must be at least 1'}), 400
+    if max_batches < 1:
+        return jsonify({'success': False, 'message': 'max_batches must be at least 1'}), 400
+    
+    summary = run_retention(app.config['AUDIT_ARCHIVE_FOLDER'], days, max_batches=max_batches)
+    
+    log_action('audit_retention', 'system', None, f"Archived {summary['archived']} audit rows older than {summary['cutoff']}")
+    return jsonify({'success': True, 'retention': summary})
+
+@app.route('/api/admin/audit/rollup')
+def api_admin_audit_rollup():
+    # Proper access control
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    query = AuditLogRollup.query
+    try:
+        if request.args.get('from'):
+            query = query.filter(AuditLogRollup.day >= datetime.fromisoformat(request.args['from']).date())
+        if request.args.get('to'):
+            query = query.filter(AuditLogRollup.day <= datetime.fromisoformat(request.args['to']).date())
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+    if request.args.get('action'):
+        query = query.filter(AuditLogRollup.action == request.args['action'])
+    
+    return jsonify({
+        'rollup': [{
+            'day': row.day.isoformat(),
+            'action': row.action,
+            'count': row.count
+        } for row in query.order_by(AuditLogRollup.day.desc(), AuditLogRollup.action).all()]
     })
 
 @app.route('/api/admin/db/clean', methods=['POST'])
@@ -788,7 +1611,8 @@ def api_admin_clean_db():
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     try:
-        # Clear all tables
+        # Clear all tables (write out buffered audit rows first so none land after the wipe)
+        audit_sink.flush()
         db.session.query(AuditLog).delete()
         db.session.query(Fine).delete()
         db.session.query(Review).delete()
@@ -799,6 +1623,7 @@ def api_admin_clean_db():
         db.session.query(SystemConfig).delete()
         
         db.session.commit()
+        reset_read_caches()
         
         # Run seeder to repopulate with demo data
         if clear_database:  # Check if seeder functions are available
@@ -813,6 +1638,7 @@ def api_admin_clean_db():
             create_wishlists(users, books)
             create_audit_logs(users)
             create_system_config()
+            reset_read_caches()
             
             print("✅ Database reset and repopulated successfully!")
             return jsonify({'success': True, 'message': 'Database cleaned and repopulated with demo data successfully'})
@@ -833,13 +1659,14 @@ def api_loan_extensions():
     # Get extension logs from audit table with user information
     extension_logs = AuditLog.query.filter_by(action='extend_loan').order_by(AuditLog.created_at.desc()).limit(50).all()
     
+    names = usernames(log.user_id for log in extension_logs)
+    
     extensions_with_user_info = []
     for log in extension_logs:
-        user = User.query.get(log.user_id) if log.user_id else None
         extensions_with_user_info.append({
             'id': log.id,
             'user_id': log.user_id,
-            'username': user.username if user else 'Unknown User',
+            'username': names.get(log.user_id, 'Unknown User'),
             'loan_id': log.resource_id,
             'details': log.details,
             'created_at': log.created_at.isoformat(),
@@ -1026,5 +1853,11 @@ def admin_logs():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        run_migrations()
+        init_search_index()
+    debug = True
+    # The debug reloader runs this module in a watcher and a serving process; sweep only in the server
+    if app.config['OVERDUE_SWEEP_INTERVAL'] and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        start_sweeper(app, app.config['OVERDUE_SWEEP_INTERVAL'], reservations_started)
     # Configure for Docker environment
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
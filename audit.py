@@ -0,0 +1,189 @@
+"""
+VulnLib Audit Sink
+Buffered, batched audit-log writer running on a background thread
+"""
+
+import atexit
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from models import db, AuditLog
+
+_STOP = object()
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+def exit_on_sigterm():
+    """Turn SIGTERM (docker stop/restart) into a normal exit so atexit hooks run
+
+    Python skips atexit when a signal's default action kills the process.
+    Leaves alone any handler installed by someone else (e.g. the reloader).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+        return
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+class AuditSink:
+    """Bounded in-process queue of audit rows, drained in batches by one writer thread
+
+    Requests only enqueue a row, so they no longer pay for an extra SQLite
+    commit, and the audit insert never commits unrelated work left in the
+    request's session. When the queue is full the record is dropped and
+    counted rather than blocking the request.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=200, flush_interval=0.2):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._stats = {'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0, 'missed_by_subscribers': 0}
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_ASYNC', True)
+        app.config.setdefault('AUDIT_QUEUE_SIZE', self.maxsize)
+        app.config.setdefault('AUDIT_BATCH_SIZE', self.batch_size)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', self.flush_interval)
+        self.app = app
+        atexit.register(self.close)
+        exit_on_sigterm()
+
+    def record(self, **fields):
+        """Queue one audit row; returns the row dict (with its id and timestamp)"""
+        row = {
+            'id': str(uuid.uuid4()),
+            'user_id': None,
+            'action': None,
+            'resource_type': None,
+            'resource_id': None,
+            'details': None,
+            'ip_address': None,
+            'created_at': datetime.utcnow(),
+        }
+        row.update(fields)
+
+        if not self.app.config['AUDIT_ASYNC']:
+            self._write([row])
+            return row
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+        return row
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        if self._queue is not None and self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout=10):
+        """Drain the queue and stop the writer thread (registered with atexit, which SIGTERM reaches too)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        thread.join(timeout)
+
+    def subscribe(self):
+        """Register a listener queue that receives every row once it is committed"""
+        subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+        stats['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['queue_size'] = self.app.config['AUDIT_QUEUE_SIZE']
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self.app.config['AUDIT_QUEUE_SIZE'])
+            self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch_size = self.app.config['AUDIT_BATCH_SIZE']
+        linger = self.app.config['AUDIT_FLUSH_INTERVAL']
+
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + linger
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        # One transaction per batch instead of one commit per audited request
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(AuditLog.__table__.insert(), batch)
+        except Exception:
+            self.app.logger.exception('Failed to write %d audit records', len(batch))
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            return
+
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            subscribers = list(self._subscribers)
+
+        # Push to live listeners only after commit, so they never see rolled-back rows
+        for subscription in subscribers:
+            for row in batch:
+                try:
+                    subscription.put_nowait(row)
+                except queue.Full:
+                    with self._lock:
+                        self._stats['missed_by_subscribers'] += 1
+
+audit_sink = AuditSink()
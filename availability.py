@@ -0,0 +1,178 @@
+"""
+VulnLib Booking Schedules
+Per-book timelines of how many copies are out, answering "how many copies
+are free from X to Y" with bisect and a sparse table
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db, Book, Loan
+
+# Loans that hold (or have reserved) a copy; pending requests are not bookings until approved
+BOOKED_STATUSES = ('reserved', 'approved', 'overdue')
+OPEN_END = datetime.max
+
+def intervals_query(book_ids, exclude=()):
+    """(book_id, start, end) of every booked loan of `book_ids`, via ix_loan_book_id_status"""
+    start = func.coalesce(Loan.from_date, Loan.approved_at, Loan.requested_at)
+    query = db.session.query(Loan.book_id, start, Loan.due_date).filter(
+        Loan.book_id.in_(list(book_ids)),
+        Loan.status.in_(BOOKED_STATUSES),
+        Loan.returned_at.is_(None)
+    )
+    if exclude:
+        query = query.filter(Loan.id.notin_(list(exclude)))
+    return query
+
+def load_intervals(book_ids, exclude=()):
+    """{book_id: [(start, end), ...]} of every booked loan"""
+    intervals = {}
+    for book_id, start, end in intervals_query(book_ids, exclude):
+        intervals.setdefault(book_id, []).append((start, end))
+    return intervals
+
+def loan_window(loan, now):
+    """[start, end) a loan would hold its copy if approved at `now`"""
+    return max(loan.from_date or now, now), loan.due_date or OPEN_END
+
+def starts_by(loan, now):
+    """Whether the loan's period has begun; later loans are reserved, not handed out"""
+    return not (loan.from_date and loan.from_date > now)
+
+class BookSchedule:
+    """Step function of copies out over time for one book; never mutated
+
+    times[i] is where the count changes and counts[i] holds on
+    [times[i], times[i + 1]). A loan still out past its due date keeps its
+    copy open-ended, so the schedule goes stale when the earliest future due
+    date passes (valid_until).
+    """
+
+    def __init__(self, intervals, now):
+        self.built_at = now
+        events = Counter()
+        self.valid_until = OPEN_END
+        for start, end in intervals:
+            if end is None or end <= now:
+                end = OPEN_END
+            else:
+                self.valid_until = min(self.valid_until, end)
+            if start is None or start >= end:
+                continue
+            events[start] += 1
+            events[end] -= 1
+
+        self.times = sorted(events)
+        counts, running = [], 0
+        for time in self.times:
+            running += events[time]
+            counts.append(running)
+
+        # levels[k][i] is the peak of counts[i:i + 2**k]
+        self.levels = [counts]
+        width = 1
+        while width * 2 <= len(counts):
+            previous = self.levels[-1]
+            self.levels.append([max(previous[i], previous[i + width]) for i in range(len(counts) - width * 2 + 1)])
+            width *= 2
+
+    def peak(self, start, end):
+        """Most copies out at any moment in [start, end)"""
+        first = max(bisect_right(self.times, start) - 1, 0)
+        last = bisect_left(self.times, end) - 1
+        if last < first:
+            return 0
+        level = (last - first + 1).bit_length() - 1
+        row = self.levels[level]
+        return max(row[first], row[last - (1 << level) + 1])
+
+    def at(self, moment):
+        """Copies out at `moment`"""
+        i = bisect_right(self.times, moment) - 1
+        return self.levels[0][i] if i >= 0 else 0
+
+    def free(self, total_copies, available_copies, start, end):
+        """Copies free for the whole of [start, end)
+
+        Copies are interchangeable until handed out, so a new loan fits
+        exactly when the peak overlap leaves one over (interval partitioning).
+        Copies off the shelf with no loan to explain them (available_copies
+        below what the loans account for) count as out indefinitely, so this
+        never promises a copy that approval's counter would refuse.
+        """
+        total_copies = total_copies or 0
+        missing = max(0, total_copies - (available_copies or 0) - self.at(self.built_at))
+        return max(0, total_copies - missing - self.peak(start, end))
+
+def fit_bookings(loans, now):
+    """Ids of `loans` whose dates fit their book's bookings, granted in order
+
+    For loans being approved in the caller's transaction: bookings are read
+    fresh after the approving UPDATE took SQLite's write lock, leaving the
+    loans themselves out, so concurrent approvals cannot both claim the last
+    copy of a date range.
+    """
+    loans = list(loans)
+    if not loans:
+        return set()
+    book_ids = {loan.book_id for loan in loans}
+    booked = load_intervals(book_ids, exclude=[loan.id for loan in loans])
+    copies = {
+        book_id: [total, available] for book_id, total, available in
+        db.session.query(Book.id, Book.total_copies, Book.available_copies).filter(Book.id.in_(book_ids))
+    }
+
+    fitted = set()
+    for loan in loans:
+        if loan.book_id not in copies:
+            continue
+        intervals = booked.setdefault(loan.book_id, [])
+        start, end = loan_window(loan, now)
+        total, available = copies[loan.book_id]
+        if BookSchedule(intervals, now).free(total, available, start, end) > 0:
+            intervals.append((start, end))
+            if starts_by(loan, now):
+                copies[loan.book_id][1] -= 1  # as take_copies will
+            fitted.add(loan.id)
+    return fitted
+
+class BookingSchedules:
+    """Lazily built BookSchedule per book
+
+    Writers drop a book's schedule after committing a loan change; a schedule
+    built from rows read before that drop is discarded rather than cached.
+    """
+
+    def __init__(self):
+        self._schedules = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, book_id, now=None):
+        now = now or datetime.utcnow()
+        schedule = self._schedules.get(book_id)
+        if schedule is None or now >= schedule.valid_until:
+            generation = self._generation
+            schedule = BookSchedule(load_intervals([book_id]).get(book_id, []), now)
+            with self._lock:
+                if generation == self._generation:
+                    self._schedules[book_id] = schedule
+        return schedule
+
+    def invalidate(self, book_ids):
+        with self._lock:
+            self._generation += 1
+            for book_id in book_ids:
+                self._schedules.pop(book_id, None)
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self._schedules = {}
+
+booking_schedules = BookingSchedules()
@@ -0,0 +1,118 @@
+"""
+VulnLib Response Cache
+Bounded LRU of serialized catalog responses with per-book invalidation,
+and version counters for conditional GETs
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+class CatalogCache:
+    """LRU of JSON response bodies for catalog reads
+
+    Every entry remembers which book ids it contains, so a change to one book
+    (e.g. its available_copies) evicts only the detail and list responses that
+    actually show it. Changes that can alter list membership, like creating or
+    importing books, evict every list response instead. Every eviction bumps a
+    generation, so a body built from rows read before the eviction is not put.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (body, book_ids)
+        self._by_book = {}  # book id -> set of keys
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self):
+        """Take before reading the rows for a body, and pass to put()"""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, body, book_ids, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # evicted while the body was built; it may show the old rows
+            if key in self._entries:
+                self._remove(key)
+            book_ids = frozenset(book_ids)
+            self._entries[key] = (body, book_ids)
+            for book_id in book_ids:
+                self._by_book.setdefault(book_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_book(self, book_id):
+        """Evict every cached response that includes `book_id`"""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._by_book.get(book_id, ())):
+                self._remove(key)
+
+    def invalidate_kind(self, kind):
+        """Evict every entry whose key starts with `kind` (e.g. all 'books' listings)"""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if k[0] == kind]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_book.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, key):
+        _, book_ids = self._entries.pop(key)
+        for book_id in book_ids:
+            keys = self._by_book.get(book_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_book[book_id]
+
+class VersionCounters:
+    """In-process version numbers per table or per row, used to derive ETags
+
+    A random epoch is part of every tag, so restarting the process (or a
+    reset after bulk changes) invalidates every tag clients hold.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:12]
+
+    def bump(self, *scopes):
+        """Record a committed change to each scope, e.g. 'user' or ('reviews', book_id)"""
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def etag(self, *scopes):
+        """Strong ETag value (unquoted) covering the current version of every scope"""
+        with self._lock:
+            parts = [str(self._versions.get(scope, 0)) for scope in scopes]
+        return f"{self.epoch}-{'.'.join(parts)}"
+
+    def reset(self):
+        with self._lock:
+            self._versions.clear()
+            self.epoch = uuid.uuid4().hex[:12]
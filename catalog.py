@@ -0,0 +1,254 @@
+"""
+VulnLib Catalog Snapshot
+Immutable in-memory copy of the book list columns with sort orders and
+category/author indexes, swapped copy-on-write whenever a book changes
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime
+
+from models import db, Book
+from loaders import IN_CHUNK_SIZE
+
+RECORD_FIELDS = (
+    'id', 'title', 'author', 'isbn', 'category', 'description', 'cover_url', 'year_published',
+    'available_copies', 'total_copies', 'tags', 'created_at',
+    'review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+)
+
+# Seek column sets the snapshot keeps a sorted order for (see BOOK_CURSOR_SORTS in app.py)
+ORDERS = (('created_at', 'id'), ('title', 'id'))
+
+FACETS = ('category', 'author', 'year', 'availability')
+
+def sort_value(value):
+    # SQLite sorts NULL first; datetime.min keeps a missing created_at comparable and first
+    return datetime.min if value is None else value
+
+class BookRecord:
+    """Read-only list columns of one book, named like Book's attributes so the
+    same serializers accept either"""
+
+    __slots__ = RECORD_FIELDS + ('author_key',)
+
+    def __init__(self, row):
+        for field, value in zip(RECORD_FIELDS, row):
+            object.__setattr__(self, field, value)
+        object.__setattr__(self, 'author_key', (self.author or '').lower())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('BookRecord is read-only')
+
+    def index_key(self):
+        """Everything the snapshot's orders and indexes depend on"""
+        return (self.created_at, self.title, self.category, self.author_key)
+
+    def facet_values(self):
+        return (
+            ('category', self.category),
+            ('author', self.author),
+            ('year', self.year_published),
+            ('availability', 'available' if (self.available_copies or 0) > 0 else 'unavailable'),
+        )
+
+def count_facets(records):
+    counts = {facet: Counter() for facet in FACETS}
+    for record in records:
+        for facet, value in record.facet_values():
+            counts[facet][value] += 1
+    return counts
+
+def top_facets(counts, limit):
+    """{facet: [{'value', 'count'}, ...]} largest first, at most `limit` values per facet"""
+    def order(item):
+        value, count = item
+        return (-count, value is None, str(value))
+
+    return {
+        facet: [{'value': value, 'count': count} for value, count in sorted(counts[facet].items(), key=order)[:limit]]
+        for facet in FACETS
+    }
+
+def load_records(book_ids=None):
+    """BookRecords for the given ids (all books when None), via column-only queries"""
+    columns = [getattr(Book, field) for field in RECORD_FIELDS]
+    if book_ids is None:
+        return [BookRecord(row) for row in db.session.query(*columns)]
+
+    book_ids = list(book_ids)
+    records = []
+    for start in range(0, len(book_ids), IN_CHUNK_SIZE):
+        chunk = book_ids[start:start + IN_CHUNK_SIZE]
+        records.extend(BookRecord(row) for row in db.session.query(*columns).filter(Book.id.in_(chunk)))
+    return records
+
+class CatalogSnapshot:
+    """Records in (created_at, id) order plus every index over them; never mutated"""
+
+    def __init__(self, records, indexes=None, facets=None):
+        self.records = tuple(records)
+        if indexes is None:
+            indexes = self._build_indexes(self.records)
+        self._indexes = indexes
+        self.orders, self.by_category, self.by_author, self.positions = indexes
+        # Unfiltered facet counts; replace() adjusts them instead of recounting
+        self.facets = count_facets(self.records) if facets is None else facets
+
+    @classmethod
+    def build(cls, records, facets=None):
+        return cls(sorted(records, key=lambda r: (sort_value(r.created_at), r.id)), facets=facets)
+
+    @staticmethod
+    def _build_indexes(records):
+        orders = {}
+        for columns in ORDERS:
+            key = lambda i: tuple(sort_value(getattr(records[i], c)) for c in columns)
+            order = tuple(sorted(range(len(records)), key=key))
+            orders[columns] = (order, tuple(key(i) for i in order))
+
+        by_category, by_author = {}, {}
+        for i, record in enumerate(records):
+            by_category.setdefault(record.category, []).append(i)
+            by_author.setdefault(record.author_key, []).append(i)
+
+        return (
+            orders,
+            {k: tuple(v) for k, v in by_category.items()},
+            {k: tuple(v) for k, v in by_author.items()},
+            {record.id: i for i, record in enumerate(records)},
+        )
+
+    def replace(self, fresh, removed=()):
+        """New snapshot with `fresh` records swapped in and `removed` ids dropped
+
+        When no sort or index key changed (the common case: availability or
+        review counts), the new snapshot shares this one's indexes.
+        """
+        changed = {record.id for record in fresh} | set(removed)
+        facets = {facet: Counter(counts) for facet, counts in self.facets.items()}
+        for book_id in changed:
+            if book_id in self.positions:
+                for facet, value in self.records[self.positions[book_id]].facet_values():
+                    facets[facet][value] -= 1
+        for record in fresh:
+            for facet, value in record.facet_values():
+                facets[facet][value] += 1
+        facets = {facet: +counts for facet, counts in facets.items()}  # unary + drops zero counts
+
+        def keeps_position(record):
+            i = self.positions.get(record.id)
+            return i is not None and self.records[i].index_key() == record.index_key()
+
+        if not removed and all(keeps_position(record) for record in fresh):
+            records = list(self.records)
+            for record in fresh:
+                records[self.positions[record.id]] = record
+            return CatalogSnapshot(records, self._indexes, facets)
+
+        kept = [record for record in self.records if record.id not in changed]
+        return CatalogSnapshot.build(kept + list(fresh), facets)
+
+    def select(self, category='', author=''):
+        """Positions matching the filters, or None for the whole catalog
+
+        category is an exact match and author a case-insensitive substring,
+        the same as the SQL filters in api_books.
+        """
+        selected = None
+        if category:
+            selected = set(self.by_category.get(category, ()))
+        if author:
+            needle = author.lower()
+            matched = set()
+            for key, positions in self.by_author.items():
+                if needle in key:
+                    matched.update(positions)
+            selected = matched if selected is None else selected & matched
+        return selected
+
+    def facet_counts(self, category='', author=''):
+        selected = self.select(category, author)
+        if selected is None:
+            return self.facets
+        return count_facets(self.records[i] for i in selected)
+
+    def count(self, category='', author=''):
+        selected = self.select(category, author)
+        return len(self.records) if selected is None else len(selected)
+
+    def page(self, page, per_page, category='', author=''):
+        """OFFSET-style page in (created_at, id) order; returns (records, total)"""
+        selected = self.select(category, author)
+        positions = range(len(self.records)) if selected is None else sorted(selected)
+        start = (max(page, 1) - 1) * per_page
+        return [self.records[i] for i in positions[start:start + per_page]], len(positions)
+
+    def seek(self, columns, cursor, per_page, descending=False, category='', author=''):
+        """Keyset page with the same contract as pagination.keyset_page"""
+        order, keys = self.orders[tuple(columns)]
+        selected = self.select(category, author)
+
+        if descending:
+            start = len(order) - 1 if cursor is None else bisect_left(keys, tuple(cursor)) - 1
+            walk = range(start, -1, -1)
+        else:
+            start = 0 if cursor is None else bisect_right(keys, tuple(cursor))
+            walk = range(start, len(order))
+
+        rows = []
+        for n in walk:
+            i = order[n]
+            if selected is None or i in selected:
+                rows.append(self.records[i])
+                if len(rows) > per_page:
+                    break
+
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            return rows, rows[-1]
+        return rows, None
+
+class Catalog:
+    """Holder of the current CatalogSnapshot
+
+    Readers take the current reference without locking. Writers build a
+    replacement under the lock and swap it in, so a listing never sees a
+    half-applied change.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = CatalogSnapshot.build(load_records())
+                snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self, book_ids):
+        """Reload the given books after a committed change (created, updated or deleted)
+
+        Returns the reloaded records, or None when no snapshot is built yet.
+        """
+        book_ids = set(book_ids)
+        if not book_ids:
+            return []
+        with self._lock:
+            if self._snapshot is None:
+                return None  # not built yet; the first read loads current rows
+            fresh = load_records(book_ids)
+            removed = book_ids - {record.id for record in fresh}
+            self._snapshot = self._snapshot.replace(fresh, removed)
+            return fresh
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+
+catalog_snapshot = Catalog()
@@ -0,0 +1,151 @@
+"""
+VulnLib Circulation
+Conditional single-statement updates for loan status and copy availability,
+for one loan or a whole batch
+"""
+
+from collections import Counter
+
+from sqlalchemy import case, func, update
+
+from models import db, Book, Loan
+from availability import fit_bookings, starts_by
+from overdue import settle_late_fines
+
+BULK_ACTIONS = ('approve', 'return', 'reject')
+
+def take_copies(book_id, count=1):
+    """Take `count` copies off the shelf, inside the caller's transaction
+
+    The guard is part of the UPDATE, so concurrent requests can never drive
+    available_copies below zero. Returns False (nothing changed) when fewer
+    than `count` copies are available.
+    """
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies >= count)
+        .values(available_copies=Book.available_copies - count)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def return_copies(book_id, count=1):
+    """Put `count` copies back, clamped to total_copies
+
+    Clamped rather than refused: seeded and imported loans may never have
+    taken their copy, and a return must still go through.
+    """
+    adjust_copies({book_id: count}, guarded=False)
+
+def transition_loan(loan_id, from_statuses, **values):
+    """Apply `values` to a loan only while its status is one of `from_statuses`
+
+    Returns False when another request changed the loan first, so the same
+    loan cannot be approved or returned twice.
+    """
+    result = db.session.execute(
+        update(Loan)
+        .where(Loan.id == loan_id, Loan.status.in_(from_statuses))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def claim_loans(loan_ids, from_statuses, **values):
+    """Set-based transition_loan: returns (id, book_id, user_id, from_date, due_date) of every loan changed"""
+    if not loan_ids:
+        return []
+    return db.session.execute(
+        update(Loan)
+        .where(Loan.id.in_(loan_ids), Loan.status.in_(from_statuses))
+        .values(**values)
+        .returning(Loan.id, Loan.book_id, Loan.user_id, Loan.from_date, Loan.due_date)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def adjust_copies(deltas, guarded=True):
+    """Apply {book_id: delta} to available_copies in one UPDATE; returns the ids changed
+
+    Guarded, a book is skipped when the result would fall outside 0..total_copies.
+    Unguarded, the result is clamped into that range instead.
+    """
+    if not deltas:
+        return set()
+    delta = case(deltas, value=Book.id, else_=0)
+    statement = update(Book).where(Book.id.in_(list(deltas)))
+    if guarded:
+        statement = statement.where(
+            Book.available_copies + delta >= 0,
+            Book.available_copies + delta <= Book.total_copies
+        ).values(available_copies=Book.available_copies + delta)
+    else:
+        statement = statement.values(
+            available_copies=func.max(0, func.min(Book.total_copies, Book.available_copies + delta))
+        )
+    rows = db.session.execute(
+        statement.returning(Book.id).execution_options(synchronize_session=False)
+    ).all()
+    return {row.id for row in rows}
+
+def bulk_loan_action(action, loan_ids, now, return_date=None):
+    """Approve, return or reject many loans inside the caller's transaction
+
+    Loans change through one conditional UPDATE, so a loan another request
+    changed first is reported instead of being touched twice. Copy counts
+    move through one aggregated UPDATE across every affected book.
+    Approvals are granted in request order while their dates fit the book's
+    bookings; loans starting later are reserved without taking a copy.
+    Returns ({loan_id: (ok, message)}, set of book ids whose availability,
+    now or for some dates, changed).
+    """
+    existing = {loan_id for (loan_id,) in db.session.query(Loan.id).filter(Loan.id.in_(loan_ids))}
+    results = {loan_id: (False, 'Loan not found') for loan_id in loan_ids if loan_id not in existing}
+    candidates = [loan_id for loan_id in loan_ids if loan_id in existing]
+
+    if action == 'reject':
+        claimed = claim_loans(candidates, ('pending',), status='rejected')
+        done = {row.id for row in claimed}
+        results.update({loan_id: (True, 'Loan rejected') if loan_id in done else (False, 'Loan is not pending')
+                        for loan_id in candidates})
+        return results, set()
+
+    if action == 'approve':
+        claimed = claim_loans(candidates, ('pending',), status='approved', approved_at=now)
+        claimed_by_id = {row.id: row for row in claimed}
+        for loan_id in candidates:
+            if loan_id not in claimed_by_id:
+                results[loan_id] = (False, 'Loan is not pending')
+
+        # Grant the book's copies for each loan's dates, first requested id first
+        ordered = [claimed_by_id[loan_id] for loan_id in candidates if loan_id in claimed_by_id]
+        fitted = fit_bookings(ordered, now)
+        granted = [row for row in ordered if row.id in fitted]
+        refused = [row for row in ordered if row.id not in fitted]
+        starting = [row for row in granted if starts_by(row, now)]
+
+        deltas = {book_id: -count for book_id, count in Counter(row.book_id for row in starting).items()}
+        changed = adjust_copies(deltas)
+        # A book whose guard failed was changed by another request since it was read
+        refused += [row for row in starting if row.book_id not in changed]
+        refused_ids = {row.id for row in refused}
+        if refused:
+            claim_loans(list(refused_ids), ('approved',), status='pending', approved_at=None)
+        reserved = [row for row in granted if not starts_by(row, now) and row.id not in refused_ids]
+        if reserved:
+            claim_loans([row.id for row in reserved], ('approved',), status='reserved')
+
+        for row in claimed:
+            results[row.id] = (False, 'No copies free for those dates') if row.id in refused_ids else (True, 'Loan approved')
+        return results, changed | {row.book_id for row in reserved}
+
+    # Return: copies go back clamped to total_copies; late returns are fined as in api_return_loan
+    returned_at = return_date or now
+    claimed = claim_loans(candidates, ('approved', 'overdue'), status='returned', returned_at=returned_at)
+    done = {row.id for row in claimed}
+    results.update({loan_id: (True, 'Loan returned') if loan_id in done else (False, 'Loan is not checked out')
+                    for loan_id in candidates})
+
+    changed = adjust_copies(dict(Counter(row.book_id for row in claimed)), guarded=False)
+
+    settle_late_fines(claimed, returned_at)
+    return results, changed
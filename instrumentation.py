@@ -0,0 +1,80 @@
+"""
+VulnLib Query Instrumentation
+Per-request SQL query counting, timing and N+1 detection
+"""
+
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PLACEHOLDER_LIST = re.compile(r'\?(\s*,\s*\?)+')
+_WHITESPACE = re.compile(r'\s+')
+
+class RepeatedQueryError(RuntimeError):
+    """Raised in strict mode when one request repeats a statement shape too often"""
+
+def statement_shape(statement):
+    """Normalize a statement so the same query with different IN-list sizes compares equal"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    return _PLACEHOLDER_LIST.sub('?', shape)
+
+def _request_stats():
+    stats = g.get('query_stats')
+    if stats is None:
+        stats = g.query_stats = {'count': 0, 'duration': 0.0, 'shapes': Counter()}
+    return stats
+
+def init_query_stats(app):
+    """Hook SQLAlchemy cursor events and report per-request query stats
+
+    Every response gets a `Server-Timing: db;dur=...` header and a debug log
+    line. Set QUERY_REPEAT_LIMIT to raise RepeatedQueryError as soon as a
+    single request runs the same statement shape more than that many times.
+    """
+    app.config.setdefault('QUERY_REPEAT_LIMIT', None)
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context():
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_start', None)
+        if started is None or not has_request_context():
+            return
+
+        elapsed = time.perf_counter() - started
+        stats = _request_stats()
+        stats['count'] += 1
+        stats['duration'] += elapsed
+
+        shape = statement_shape(statement)
+        stats['shapes'][shape] += 1
+
+        limit = app.config.get('QUERY_REPEAT_LIMIT')
+        if limit and stats['shapes'][shape] > limit:
+            raise RepeatedQueryError(
+                f'{request.method} {request.path} ran the same statement {stats["shapes"][shape]} times '
+                f'(limit {limit}): {shape}'
+            )
+
+    @app.after_request
+    def report_query_stats(response):
+        # Requests served without touching the database still report zero
+        stats = _request_stats()
+
+        duration_ms = stats['duration'] * 1000
+        response.headers.add('Server-Timing', f'db;dur={duration_ms:.2f};desc="{stats["count"]} queries"')
+
+        repeated = stats['shapes'].most_common(1)
+        app.logger.debug(
+            '%s %s: %d queries in %.2fms (most repeated: %dx)',
+            request.method, request.path, stats['count'], duration_ms,
+            repeated[0][1] if repeated else 0
+        )
+        return response
@@ -0,0 +1,42 @@
+"""
+VulnLib Batch Loaders
+Resolve referenced users and books for a whole result set in one query
+"""
+
+from models import db, User, Book
+
+# Stay well below SQLite's bound-parameter limit on older builds (999)
+IN_CHUNK_SIZE = 500
+
+def resolve(model, ids, *columns):
+    """Fetch `columns` of `model` for every distinct non-null id, keyed by id
+
+    Issues one `WHERE id IN (...)` query per IN_CHUNK_SIZE ids instead of one
+    query per row. Ids that do not exist are simply absent from the result.
+    Without `columns`, the values are the model instances themselves.
+    """
+    wanted = list({i for i in ids if i is not None})
+    found = {}
+
+    for start in range(0, len(wanted), IN_CHUNK_SIZE):
+        chunk = wanted[start:start + IN_CHUNK_SIZE]
+        if not columns:
+            found.update((obj.id, obj) for obj in model.query.filter(model.id.in_(chunk)).all())
+            continue
+        rows = db.session.query(model.id, *columns).filter(model.id.in_(chunk)).all()
+        for row in rows:
+            found[row[0]] = row[1] if len(columns) == 1 else row[1:]
+
+    return found
+
+def usernames(user_ids):
+    """Map user id -> username"""
+    return resolve(User, user_ids, User.username)
+
+def books(book_ids):
+    """Map book id -> Book"""
+    return resolve(Book, book_ids)
+
+def book_titles_and_authors(book_ids):
+    """Map book id -> (title, author)"""
+    return resolve(Book, book_ids, Book.title, Book.author)
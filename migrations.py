@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+VulnLib Schema Migrations
+Applies schema changes to an existing database without rebuilding it
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --check    # verify hot queries use their indexes
+"""
+
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, Book, Loan, Review, Fine, Wishlist, AuditLog
+from aggregates import rebuild_review_aggregates
+
+def create_indexes(*names):
+    """Migration step creating the named model indexes if they are missing"""
+    def apply(connection):
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(connection, checkfirst=True)
+    return apply
+
+def drop_indexes(*names):
+    """Migration step dropping indexes that have been superseded"""
+    def apply(connection):
+        for name in names:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    return apply
+
+def add_columns(table_name, *names):
+    """Migration step adding the named model columns to an existing table"""
+    def apply(connection):
+        table = db.metadata.tables[table_name]
+        existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table_name})"))}
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            ddl = f"ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(connection.dialect)}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            connection.execute(text(ddl))
+    return apply
+
+def steps(*functions):
+    """Run several migration steps inside one migration's transaction"""
+    def apply(connection):
+        for function in functions:
+            function(connection)
+    return apply
+
+def backfill_loan_from_date(connection):
+    # Loans made before from_date was stored started when approved (or requested)
+    connection.execute(text("UPDATE loan SET from_date = COALESCE(approved_at, requested_at) WHERE from_date IS NULL"))
+
+# Ordered, append-only. Never edit or reorder an entry once it has shipped.
+MIGRATIONS = [
+    ('0001_secondary_indexes', create_indexes(
+        'ix_book_created_at_id',
+        'ix_book_title_id',
+        'ix_loan_user_id_requested_at',
+        'ix_loan_status_requested_at',
+        'ix_loan_requested_at',
+        'ix_review_book_id_created_at',
+        'ix_fine_user_id_status',
+        'ix_wishlist_user_id_created_at',
+        'ix_audit_log_action_created_at',
+        'ix_audit_log_created_at',
+    )),
+    ('0002_audit_log_search_indexes', create_indexes(
+        'ix_audit_log_user_id_created_at',
+        'ix_audit_log_resource_type_created_at',
+        'ix_audit_log_ip_address_created_at',
+    )),
+    ('0003_book_review_aggregates', steps(
+        add_columns('book', 'review_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'),
+        rebuild_review_aggregates,
+    )),
+    ('0004_overdue_sweep_indexes', create_indexes(
+        'ix_loan_status_due_date',
+        'ix_fine_loan_id_status',
+    )),
+    ('0005_loan_from_date', steps(
+        add_columns('loan', 'from_date'),
+        backfill_loan_from_date,
+        create_indexes('ix_loan_book_id_status'),
+    )),
+    ('0006_audit_log_keyset_indexes', steps(
+        # Keyset pages order and seek on (created_at, id); without id the tiebreak needs a temp B-tree
+        drop_indexes(
+            'ix_audit_log_action_created_at',
+            'ix_audit_log_created_at',
+            'ix_audit_log_user_id_created_at',
+            'ix_audit_log_resource_type_created_at',
+            'ix_audit_log_ip_address_created_at',
+        ),
+        create_indexes(
+            'ix_audit_log_action_created_at_id',
+            'ix_audit_log_created_at_id',
+            'ix_audit_log_user_id_created_at_id',
+            'ix_audit_log_resource_type_created_at_id',
+            'ix_audit_log_ip_address_created_at_id',
+        ),
+    )),
+    ('0007_loan_queue_keyset_indexes', steps(
+        drop_indexes('ix_loan_status_requested_at', 'ix_loan_requested_at'),
+        create_indexes('ix_loan_status_requested_at_id', 'ix_loan_requested_at_id'),
+    )),
+]
+
+def run_migrations():
+    """Apply every migration not yet recorded in schema_migration, each in its own transaction"""
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migration ("
+            "id VARCHAR(100) PRIMARY KEY, applied_at DATETIME NOT NULL)"
+        ))
+        applied = {row[0] for row in connection.execute(text("SELECT id FROM schema_migration"))}
+
+    pending = [(name, step) for name, step in MIGRATIONS if name not in applied]
+    for name, step in pending:
+        with db.engine.begin() as connection:
+            step(connection)
+            connection.execute(
+                text("INSERT INTO schema_migration (id, applied_at) VALUES (:id, :applied_at)"),
+                {'id': name, 'applied_at': datetime.utcnow()}
+            )
+        print(f"✅ Applied migration {name}")
+
+    return [name for name, _ in pending]
+
+def hot_queries():
+    """(endpoint, query, index it must use) for every hot filter in app.py
+
+    Built with the endpoints' own query helpers, so the plans checked are
+    the ones served, keyset seek and tiebreak included.
+    """
+    from app import loans_with_names, audit_search_query, AUDIT_LOG_KEY, AUDIT_TAIL_LIMIT, LIST_PAGE_DEFAULT
+    from availability import intervals_query
+    from pagination import keyset_query
+
+    moment = datetime(2000, 1, 1)
+    loan_key = (Loan.requested_at, Loan.id)
+    return [
+        ('/api/books?cursor=&sort=newest',
+         Book.query.order_by(Book.created_at.desc(), Book.id.desc()).limit(13),
+         'ix_book_created_at_id'),
+        ('/api/books?cursor=&sort=title',
+         Book.query.order_by(Book.title, Book.id).limit(13),
+         'ix_book_title_id'),
+        ('/api/users/<user_id>/loans',
+         Loan.query.filter(Loan.user_id == 'user-id'),
+         'ix_loan_user_id_requested_at'),
+        ('/api/loans/pending?cursor=',
+         keyset_query(loans_with_names().filter(Loan.status == 'pending'), loan_key,
+                      (moment, 'loan-id'), LIST_PAGE_DEFAULT),
+         'ix_loan_status_requested_at_id'),
+        ('overdue.py (mark overdue)',
+         Loan.query.filter(Loan.status == 'approved', Loan.due_date < moment),
+         'ix_loan_status_due_date'),
+        ('overdue.py (fines per loan)',
+         Fine.query.filter(Fine.loan_id == 'loan-id', Fine.status == 'unpaid'),
+         'ix_fine_loan_id_status'),
+        ('/api/books/<book_id>/availability',
+         intervals_query(['book-id']),
+         'ix_loan_book_id_status'),
+        ('/api/loans/all?cursor=',
+         keyset_query(loans_with_names(), loan_key, (moment, 'loan-id'), LIST_PAGE_DEFAULT, descending=True),
+         'ix_loan_requested_at_id'),
+        ('/api/users/<user_id>/fines',
+         Fine.query.filter(Fine.user_id == 'user-id'),
+         'ix_fine_user_id_status'),
+        ('/api/books/<book_id>/reviews',
+         Review.query.filter(Review.book_id == 'book-id'),
+         'ix_review_book_id_created_at'),
+        ('/api/users/<user_id>/wishlist',
+         Wishlist.query.filter(Wishlist.user_id == 'user-id'),
+         'ix_wishlist_user_id_created_at'),
+        ('/api/loans/extensions',
+         AuditLog.query.filter(AuditLog.action == 'extend_loan').order_by(AuditLog.created_at.desc()).limit(50),
+         'ix_audit_log_action_created_at_id'),
+        ('/api/admin/logs',
+         keyset_query(AuditLog.query, AUDIT_LOG_KEY, None, AUDIT_TAIL_LIMIT, descending=True),
+         'ix_audit_log_created_at_id'),
+        ('/api/admin/logs?since=',
+         keyset_query(AuditLog.query, AUDIT_LOG_KEY, (moment, 'log-id'), AUDIT_TAIL_LIMIT),
+         'ix_audit_log_created_at_id'),
+        ('/api/admin/logs/search?user_id=&cursor=',
+         keyset_query(audit_search_query({'user_id': 'user-id'}), AUDIT_LOG_KEY, (moment, 'log-id'), 50, descending=True),
+         'ix_audit_log_user_id_created_at_id'),
+        ('/api/admin/logs/search?resource_type=&cursor=',
+         keyset_query(audit_search_query({'resource_type': 'loan'}), AUDIT_LOG_KEY, (moment, 'log-id'), 50, descending=True),
+         'ix_audit_log_resource_type_created_at_id'),
+        ('/api/admin/logs/search?ip_address=&cursor=',
+         keyset_query(audit_search_query({'ip_address': '127.0.0.1'}), AUDIT_LOG_KEY, (moment, 'log-id'), 50, descending=True),
+         'ix_audit_log_ip_address_created_at_id'),
+    ]
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return [row[-1] for row in rows]
+
+def check_query_plans():
+    """Verify each hot query is planned through its index without a sort; returns the failures"""
+    failures = []
+    for endpoint, query, index in hot_queries():
+        plan = explain(query)
+        if any(index in line for line in plan) and not any('TEMP B-TREE' in line for line in plan):
+            print(f"✅ {endpoint}: {index}")
+        else:
+            print(f"❌ {endpoint}: expected {index}, got {' | '.join(plan)}")
+            failures.append(endpoint)
+    return failures
+
+def main():
+    from app import app
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        if '--check' in sys.argv:
+            failures = check_query_plans()
+            if failures:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -35,6 +35,21 @@ class Book(db.Model):
     tags = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Review aggregates, maintained on write (see aggregates.py)
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Seek indexes for keyset pagination in /api/books
+    __table_args__ = (
+        db.Index('ix_book_created_at_id', 'created_at', 'id'),
+        db.Index('ix_book_title_id', 'title', 'id'),
+    )
+    
     # Relationships
     loans = db.relationship('Loan', backref='book', lazy=True)
     reviews = db.relationship('Review', backref='book', lazy=True)
@@ -46,10 +61,19 @@ class Loan(db.Model):
     book_id = db.Column(db.String(36), db.ForeignKey('book.id'), nullable=False)
     requested_at = db.Column(db.DateTime, default=datetime.utcnow)
     approved_at = db.Column(db.DateTime)
+    from_date = db.Column(db.DateTime)  # start of the requested loan period
     due_date = db.Column(db.DateTime)
     returned_at = db.Column(db.DateTime)
-    status = db.Column(db.String(20), default='pending')  # pending, approved, returned, overdue
+    status = db.Column(db.String(20), default='pending')  # pending, reserved, approved, returned, overdue, rejected
     notes = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.Index('ix_loan_user_id_requested_at', 'user_id', 'requested_at'),
+        db.Index('ix_loan_status_requested_at_id', 'status', 'requested_at', 'id'),
+        db.Index('ix_loan_requested_at_id', 'requested_at', 'id'),
+        db.Index('ix_loan_status_due_date', 'status', 'due_date'),
+        db.Index('ix_loan_book_id_status', 'book_id', 'status'),
+    )
 
 class Review(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -58,6 +82,10 @@ class Review(db.Model):
     rating = db.Column(db.Integer, nullable=False)  # 1-5
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_review_book_id_created_at', 'book_id', 'created_at'),
+    )
 
 class Fine(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -68,12 +96,21 @@ class Fine(db.Model):
     status = db.Column(db.String(20), default='unpaid')  # unpaid, paid
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     paid_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_fine_user_id_status', 'user_id', 'status'),
+        db.Index('ix_fine_loan_id_status', 'loan_id', 'status'),
+    )
 
 class Wishlist(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     book_id = db.Column(db.String(36), db.ForeignKey('book.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_wishlist_user_id_created_at', 'user_id', 'created_at'),
+    )
 
 class AuditLog(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -84,6 +121,24 @@ class AuditLog(db.Model):
     details = db.Column(db.Text)
     ip_address = db.Column(db.String(45))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_audit_log_action_created_at_id', 'action', 'created_at', 'id'),
+        db.Index('ix_audit_log_created_at_id', 'created_at', 'id'),
+        db.Index('ix_audit_log_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_audit_log_resource_type_created_at_id', 'resource_type', 'created_at', 'id'),
+        db.Index('ix_audit_log_ip_address_created_at_id', 'ip_address', 'created_at', 'id'),
+    )
+
+class AuditLogRollup(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    day = db.Column(db.Date, nullable=False)
+    action = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('day', 'action', name='uq_audit_log_rollup_day_action'),
+    )
 
 class SystemConfig(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+VulnLib Overdue Sweeper
+Hands out reserved loans whose period has begun, marks loans past their
+due date as overdue and keeps one accruing unpaid fine per overdue loan,
+using a handful of set-based statements
+
+Usage:
+    python overdue.py    # run one sweep (e.g. from cron every few minutes)
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, func, text, update, DateTime
+
+from models import db, Book, Loan, Fine, SystemConfig
+
+DEFAULT_FINE_PER_DAY = 1.0
+
+# Days late and amount still owed for every overdue loan: whole days past due
+# times the daily rate, less whatever was already paid against that loan
+DUE = """
+    SELECT loan_id, user_id, days, days * :rate - paid AS amount FROM (
+        SELECT loan.id AS loan_id, loan.user_id AS user_id,
+               CAST(julianday(:now) - julianday(loan.due_date) AS INTEGER) AS days,
+               COALESCE((
+                   SELECT SUM(fine.amount) FROM fine
+                   WHERE fine.loan_id = loan.id AND fine.status = 'paid'
+               ), 0) AS paid
+        FROM loan WHERE loan.status = 'overdue'
+    )
+"""
+
+def fine_per_day():
+    """The configured daily fine (SystemConfig 'fine_per_day')"""
+    config = SystemConfig.query.filter_by(key='fine_per_day').first()
+    try:
+        return float(config.value) if config else DEFAULT_FINE_PER_DAY
+    except ValueError:
+        return DEFAULT_FINE_PER_DAY
+
+def settle_late_fines(loans, returned_at, rate=None):
+    """Turn the fines of just-returned loans into their final late-return fines
+
+    `loans` are rows or objects with id, user_id and due_date; runs inside the
+    caller's transaction. The amount follows DUE: whole days late times the
+    daily rate, less what was already paid against the loan. An accruing fine
+    is settled in place, and nothing is charged when nothing is left owed.
+    """
+    late = [loan for loan in loans if loan.due_date and returned_at > loan.due_date]
+    if not late:
+        return
+    rate = fine_per_day() if rate is None else rate
+    loan_ids = [loan.id for loan in late]
+    paid = dict(db.session.query(Fine.loan_id, func.sum(Fine.amount)).filter(
+        Fine.loan_id.in_(loan_ids), Fine.status == 'paid'
+    ).group_by(Fine.loan_id))
+    accruing = dict(db.session.query(Fine.loan_id, Fine.id).filter(
+        Fine.loan_id.in_(loan_ids), Fine.status == 'unpaid'
+    ))
+
+    updates, inserts, settled = [], [], []
+    for loan in late:
+        days = (returned_at - loan.due_date).days
+        amount = days * rate - (paid.get(loan.id) or 0)
+        if amount <= 0:
+            if loan.id in accruing:
+                settled.append(accruing[loan.id])
+            continue
+        fine = {'amount': amount, 'reason': f'Late return: {days} days'}
+        if loan.id in accruing:
+            updates.append(dict(fine, id=accruing[loan.id]))
+        else:
+            inserts.append(dict(fine, id=str(uuid.uuid4()), loan_id=loan.id, user_id=loan.user_id,
+                                status='unpaid', created_at=datetime.utcnow()))
+
+    if updates:
+        db.session.execute(update(Fine), updates)
+    if inserts:
+        db.session.execute(Fine.__table__.insert(), inserts)
+    if settled:
+        # Already paid in full: the accruing fine has nothing left to collect
+        db.session.execute(delete(Fine).where(Fine.id.in_(settled)).execution_options(synchronize_session=False))
+
+def sweep_overdue(now=None, rate=None, books_changed=None):
+    """Run one sweep in its own transaction and return a summary dict
+
+    Idempotent: a second sweep at the same `now` changes nothing. Loans are
+    found through ix_loan_status_due_date and fines through
+    ix_fine_loan_id_status, so the cost follows the number of overdue loans,
+    not the size of the loan table. books_changed, if given, is called after
+    the commit with the ids of books whose available_copies moved.
+    """
+    now = now or datetime.utcnow()
+    rate = fine_per_day() if rate is None else rate
+    params = {'now': now, 'rate': rate}
+
+    def statement(sql):
+        return text(sql).bindparams(bindparam('now', type_=DateTime))
+
+    with db.engine.begin() as connection:
+        # Reserved loans whose period has begun take their copy off the shelf
+        started = Counter(row.book_id for row in connection.execute(
+            update(Loan)
+            .where(Loan.status == 'reserved', Loan.from_date <= now)
+            .values(status='approved')
+            .returning(Loan.book_id)
+        ))
+        if started:
+            connection.execute(
+                update(Book)
+                .where(Book.id == bindparam('reserved_book'))
+                .values(available_copies=func.max(0, Book.available_copies - bindparam('taken'))),
+                [{'reserved_book': book_id, 'taken': taken} for book_id, taken in started.items()]
+            )
+
+        marked = connection.execute(
+            update(Loan)
+            .where(Loan.status == 'approved', Loan.returned_at.is_(None), Loan.due_date < now)
+            .values(status='overdue')
+        ).rowcount
+
+        # Loans whose due date was extended past now are checked out again
+        cleared = connection.execute(
+            update(Loan)
+            .where(Loan.status == 'overdue', Loan.due_date >= now)
+            .values(status='approved')
+        ).rowcount
+
+        updated = connection.execute(statement(f"""
+            UPDATE fine SET amount = due.amount, reason = 'Overdue: ' || due.days || ' days'
+            FROM ({DUE}) AS due
+            WHERE fine.loan_id = due.loan_id AND fine.status = 'unpaid' AND fine.amount != due.amount
+        """), params).rowcount
+
+        missing = connection.execute(statement(f"""
+            SELECT due.loan_id, due.user_id, due.days, due.amount FROM ({DUE}) AS due
+            WHERE due.amount > 0 AND NOT EXISTS (
+                SELECT 1 FROM fine WHERE fine.loan_id = due.loan_id AND fine.status = 'unpaid'
+            )
+        """), params).all()
+        if missing:
+            connection.execute(Fine.__table__.insert(), [{
+                'id': str(uuid.uuid4()),
+                'user_id': row.user_id,
+                'loan_id': row.loan_id,
+                'amount': row.amount,
+                'reason': f'Overdue: {row.days} days',
+                'status': 'unpaid',
+                'created_at': now
+            } for row in missing])
+
+    if started and books_changed:
+        books_changed(list(started))
+
+    return {
+        'as_of': now.isoformat(),
+        'reservations_started': sum(started.values()),
+        'marked_overdue': marked,
+        'cleared_overdue': cleared,
+        'fines_created': len(missing),
+        'fines_updated': updated
+    }
+
+def start_sweeper(app, interval, books_changed=None):
+    """Run sweep_overdue every `interval` seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    summary = sweep_overdue(books_changed=books_changed)
+                    app.logger.info('Overdue sweep: %s', summary)
+                except Exception:
+                    app.logger.exception('Overdue sweep failed')
+
+    thread = threading.Thread(target=run, name='overdue-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    from app import app
+
+    with app.app_context():
+        summary = sweep_overdue()
+
+    print(f"✅ Marked {summary['marked_overdue']} loans overdue, created {summary['fines_created']} "
+          f"and updated {summary['fines_updated']} fines")
+
+if __name__ == '__main__':
+    main()
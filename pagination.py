@@ -0,0 +1,88 @@
+"""
+VulnLib Pagination Helpers
+Opaque keyset cursors and cached totals for list endpoints
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+COUNT_CACHE_TTL = 30  # seconds
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+def encode_cursor(values):
+    """Pack the seek key of the last row into an opaque, URL-safe token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types):
+    """Unpack a cursor produced by encode_cursor, converting each value to its column type"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise InvalidCursor(cursor)
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(payload, types)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+def keyset_query(query, columns, cursor, per_page, descending=False):
+    """The SELECT keyset_page runs: seek past the cursor, order on `columns`, one row over the page"""
+    if cursor is not None:
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*cursor))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*cursor))
+
+    order = [c.desc() for c in columns] if descending else list(columns)
+    return query.order_by(None).order_by(*order).limit(per_page + 1)
+
+def keyset_page(query, columns, cursor, per_page, descending=False):
+    """Fetch one page by seeking past the cursor on `columns` instead of using OFFSET
+
+    `columns` must end with a unique column so the ordering is total. Returns
+    (rows, last_row) where last_row is None when there is no further page.
+    """
+    rows = keyset_query(query, columns, cursor, per_page, descending).all()
+
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return rows, rows[-1]
+    return rows, None
+
+def cached_value(key, compute, ttl=COUNT_CACHE_TTL):
+    """Result of `compute()`, memoized per key for `ttl` seconds"""
+    now = time.monotonic()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    value = compute()
+
+    with _count_lock:
+        _count_cache[key] = (now + ttl, value)
+    return value
+
+def cached_count(key, query, ttl=COUNT_CACHE_TTL):
+    """COUNT(*) for `query`, memoized per key for `ttl` seconds"""
+    return cached_value(key, lambda: query.order_by(None).count(), ttl)
+
+def invalidate_counts(prefix=None):
+    """Drop cached totals, optionally only those namespaced under `prefix`"""
+    with _count_lock:
+        if prefix is None:
+            _count_cache.clear()
+        else:
+            for key in [k for k in _count_cache if k[0] == prefix]:
+                del _count_cache[key]
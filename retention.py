@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+VulnLib Audit Log Retention
+Rolls old audit rows up into daily per-action counts, archives them as
+gzip'd NDJSON (one file per day) and deletes them from the hot table
+
+Usage:
+    python retention.py              # use the audit_retention_days setting
+    python retention.py --days 30    # override the retention window
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, AuditLog, AuditLogRollup, SystemConfig
+
+DEFAULT_RETENTION_DAYS = 90
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05  # seconds between batches so request writers can take the lock
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'action', 'resource_type', 'resource_id', 'details', 'ip_address', 'created_at')
+
+def retention_days():
+    """The configured retention window (SystemConfig 'audit_retention_days')"""
+    config = SystemConfig.query.filter_by(key='audit_retention_days').first()
+    try:
+        return int(config.value) if config else DEFAULT_RETENTION_DAYS
+    except ValueError:
+        return DEFAULT_RETENTION_DAYS
+
+def archive_path(archive_dir, day):
+    return os.path.join(archive_dir, f'audit_log-{day.isoformat()}.ndjson.gz')
+
+def archive_batch(archive_dir, rows):
+    """Append rows to their day's gzip'd NDJSON file, fsynced before returning"""
+    by_day = defaultdict(list)
+    for row in rows:
+        by_day[row.created_at.date()].append(row)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    for day, day_rows in by_day.items():
+        # Appending writes a new gzip member; readers see one concatenated stream
+        with open(archive_path(archive_dir, day), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                for row in day_rows:
+                    record = {field: getattr(row, field) for field in ARCHIVE_FIELDS}
+                    record['created_at'] = row.created_at.isoformat()
+                    archive.write((json.dumps(record) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+def rollup_and_delete(rows):
+    """Fold a batch into the daily counts and delete it, in one short transaction"""
+    counts = Counter((row.created_at.date(), row.action) for row in rows)
+
+    with db.engine.begin() as connection:
+        for (day, action), count in counts.items():
+            statement = insert(AuditLogRollup.__table__).values(day=day, action=action, count=count)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=['day', 'action'],
+                set_={'count': AuditLogRollup.__table__.c.count + statement.excluded.count}
+            ))
+        connection.execute(
+            AuditLog.__table__.delete().where(AuditLog.__table__.c.id.in_([row.id for row in rows]))
+        )
+
+def run_retention(archive_dir, days=None, batch_size=BATCH_SIZE, max_batches=None, pause=BATCH_PAUSE):
+    """Archive, roll up and delete audit rows older than `days`, oldest first
+
+    Work happens in small keyset batches so no single transaction holds the
+    SQLite write lock for long. Each batch is archived and fsynced before it
+    is deleted, so a crash can at worst archive a batch twice, never lose it.
+    Returns a summary dict.
+    """
+    days = retention_days() if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    columns = (AuditLog.created_at, AuditLog.id)
+
+    summary = {'cutoff': cutoff.isoformat(), 'archived': 0, 'batches': 0, 'complete': True}
+    after = None
+    while True:
+        if max_batches is not None and summary['batches'] >= max_batches:
+            summary['complete'] = False
+            break
+
+        query = AuditLog.query.filter(AuditLog.created_at < cutoff)
+        if after is not None:
+            query = query.filter(tuple_(*columns) > tuple_(*after))
+        rows = query.order_by(*columns).limit(batch_size).all()
+        if not rows:
+            break
+
+        archive_batch(archive_dir, rows)
+        after = (rows[-1].created_at, rows[-1].id)
+        rollup_and_delete(rows)
+        db.session.expunge_all()
+
+        summary['archived'] += len(rows)
+        summary['batches'] += 1
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause)
+
+    return summary
+
+def main():
+    from app import app
+
+    days = None
+    if '--days' in sys.argv:
+        days = int(sys.argv[sys.argv.index('--days') + 1])
+
+    with app.app_context():
+        db.create_all()
+        summary = run_retention(app.config['AUDIT_ARCHIVE_FOLDER'], days)
+
+    print(f"✅ Archived {summary['archived']} audit rows older than {summary['cutoff']} "
+          f"in {summary['batches']} batches")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+VulnLib Catalog Search Index
+SQLite FTS5 index mirroring the book table for ranked full-text search
+"""
+
+import re
+
+from sqlalchemy import column, func, literal_column, table, text
+
+from models import db, Book
+
+# Column weights for bm25(): book_id, title, author, description, tags
+BM25_WEIGHTS = (0.0, 10.0, 5.0, 1.0, 2.0)
+
+book_fts = table('book_fts', column('rowid'), column('book_id'))
+
+_fts_ready = False
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(
+        book_id UNINDEXED, title, author, description, tags,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # Keep the index in sync with every write path (create, import, edit, delete)
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts(rowid, book_id, title, author, description, tags)
+        VALUES (new.rowid, new.id, new.title, new.author, new.description, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN
+        DELETE FROM book_fts WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE OF id, title, author, description, tags ON book BEGIN
+        DELETE FROM book_fts WHERE rowid = old.rowid;
+        INSERT INTO book_fts(rowid, book_id, title, author, description, tags)
+        VALUES (new.rowid, new.id, new.title, new.author, new.description, new.tags);
+    END
+    """,
+]
+
+def init_search_index():
+    """Create the FTS5 table and sync triggers, populating it on first run"""
+    global _fts_ready
+
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'")
+    ).first()
+
+    for statement in SCHEMA:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+    if not exists:
+        rebuild_search_index()
+
+    _fts_ready = True
+
+def rebuild_search_index():
+    """Repopulate the FTS5 table from the book table (e.g. after VACUUM renumbers rowids)"""
+    db.session.execute(text("DELETE FROM book_fts"))
+    db.session.execute(text("""
+        INSERT INTO book_fts(rowid, book_id, title, author, description, tags)
+        SELECT rowid, id, title, author, description, tags FROM book
+    """))
+    db.session.commit()
+
+def search_index_ready():
+    """Whether book_fts exists in the current database (checked once per process)"""
+    global _fts_ready
+
+    if not _fts_ready:
+        _fts_ready = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'")
+        ).first() is not None
+    return _fts_ready
+
+def build_match_expression(search):
+    """Turn free text into an FTS5 query where every term is a quoted prefix match"""
+    terms = re.findall(r'\w+', search, re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def search_books(query, search):
+    """Restrict a Book query to FTS5 matches for `search`, ordered by bm25 rank
+
+    Returns None when the search cannot be served from the index, so the
+    caller can fall back to a plain LIKE filter.
+    """
+    match = build_match_expression(search)
+    if not match or not search_index_ready():
+        return None
+
+    rank = func.bm25(literal_column('book_fts'), *BM25_WEIGHTS)
+    matches = db.session.query(
+        book_fts.c.book_id.label('book_id'),
+        rank.label('rank')
+    ).filter(literal_column('book_fts').op('MATCH')(match)).subquery()
+
+    return query.join(matches, Book.id == matches.c.book_id).order_by(matches.c.rank, Book.id)
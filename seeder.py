@@ -14,6 +14,10 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app
 from models import db, User, Book, Loan, Review, Fine, Wishlist, AuditLog, SystemConfig
+from search_index import init_search_index
+from migrations import run_migrations
+from aggregates import rebuild_review_aggregates
+from overdue import sweep_overdue
 
 def clear_database():
     """Clear all data from the database"""
@@ -357,6 +361,7 @@ def create_loans(users, books):
             status=loan_data['status'],
             requested_at=loan_data['requested_at'],
             approved_at=loan_data.get('approved_at'),
+            from_date=loan_data.get('approved_at') or loan_data['requested_at'],
             due_date=loan_data['due_date'],
             returned_at=loan_data.get('returned_at'),
             notes=f"Demo loan for {loan_data['book'].title}"
@@ -437,6 +442,7 @@ def create_reviews(users, books):
         reviews.append(review)
     
     db.session.commit()
+    rebuild_review_aggregates()
     print(f"✅ Created {len(reviews)} demo reviews")
     return reviews
 
@@ -444,23 +450,9 @@ def create_fines(users, loans):
     """Create demo fines for overdue books"""
     print("💰 Creating demo fines...")
     
-    # Find overdue loans
-    overdue_loans = [loan for loan in loans if loan.due_date and loan.due_date < datetime.now() and loan.status == 'approved']
-    
-    fines = []
-    for loan in overdue_loans:
-        days_overdue = (datetime.now() - loan.due_date).days
-        fine_amount = days_overdue * 1.0  # $1 per day
-        
-        fine = Fine(
-            user_id=loan.user_id,
-            loan_id=loan.id,
-            amount=fine_amount,
-            reason=f'Late return of "{loan.book.title}" - {days_overdue} days overdue',
-            status='unpaid'
-        )
-        db.session.add(fine)
-        fines.append(fine)
+    # Overdue loans are found and fined by the same set-based sweep the app schedules
+    sweep_overdue()
+    fines = Fine.query.filter_by(status='unpaid').all()
     
     # Add some paid fines from history
     paid_fine = Fine(
@@ -588,6 +580,11 @@ def create_system_config():
             'value': 'Dear {username}, your book is overdue. Please return it as soon as possible.',
             'description': 'Email template for overdue notifications'
         },
+        {
+            'key': 'audit_retention_days',
+            'value': '90',
+            'description': 'Days of raw audit log history kept before archival'
+        },
         {
             'key': 'library_name',
             'value': 'VulnLib Education Center',
@@ -622,6 +619,8 @@ def main():
     with app.app_context():
         # Create tables
         db.create_all()
+        run_migrations()
+        init_search_index()
         
         # Clear existing data
         clear_database()
@@ -0,0 +1,113 @@
+"""
+VulnLib Typeahead Index
+In-memory sorted prefix index over book titles, authors, ISBNs and tags
+"""
+
+import re
+import threading
+from bisect import bisect_left
+
+from models import db, Book
+
+# Lower sorts first: a title match beats an author match for the same prefix
+KIND_RANK = {'title': 0, 'author': 1, 'isbn': 2, 'tag': 3}
+MAX_SCAN = 256  # bound the work per query regardless of catalog size
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+def book_terms(title, author, isbn, tags):
+    """(term, kind) pairs to index: each full field plus every word in it"""
+    terms = set()
+    for kind, value in (('title', title), ('author', author)):
+        if value:
+            value = value.lower()
+            terms.add((value, kind))
+            terms.update((word, kind) for word in _WORD.findall(value) if len(word) > 1)
+    if isbn:
+        terms.add((isbn.replace('-', '').replace(' ', '').lower(), 'isbn'))
+    for tag in (tags or '').split(','):
+        tag = tag.strip().lower()
+        if tag:
+            terms.add((tag, 'tag'))
+    return terms
+
+class PrefixIndex:
+    """Sorted array of (term, kind rank, book id) searched with bisect
+
+    Readers take the current array reference without locking; writers build a
+    new array and swap it in (copy-on-write), so a query never sees a
+    half-applied update.
+    """
+
+    def __init__(self):
+        self._entries = None
+        self._books = {}  # book id -> (title, author)
+        self._lock = threading.Lock()
+
+    def ensure_built(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._build()
+
+    def _build(self):
+        rows = db.session.query(Book.id, Book.title, Book.author, Book.isbn, Book.tags).all()
+        entries = []
+        books = {}
+        for book_id, title, author, isbn, tags in rows:
+            books[book_id] = (title, author)
+            entries.extend((term, KIND_RANK[kind], book_id) for term, kind in book_terms(title, author, isbn, tags))
+        entries.sort()
+        self._books = books
+        self._entries = entries
+
+    def add_books(self, books):
+        """Index newly created books (BookRecords) without rebuilding from the database"""
+        if self._entries is None:
+            return  # not built yet; the first query will load them
+        with self._lock:
+            added = []
+            books_map = dict(self._books)
+            for book in books:
+                books_map[book.id] = (book.title, book.author)
+                added.extend((term, KIND_RANK[kind], book.id)
+                             for term, kind in book_terms(book.title, book.author, book.isbn, book.tags))
+            entries = self._entries + sorted(added)
+            entries.sort()  # two sorted runs: timsort merges them in linear time
+            self._books = books_map
+            self._entries = entries
+
+    def reset(self):
+        with self._lock:
+            self._entries = None
+            self._books = {}
+
+    def suggest(self, prefix, limit=8):
+        """Books whose title, author, ISBN or tag (or a word in them) starts with `prefix`"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self.ensure_built()
+        entries, books = self._entries, self._books
+
+        best = {}
+        start = bisect_left(entries, (prefix,))
+        for term, rank, book_id in entries[start:start + MAX_SCAN]:
+            if not term.startswith(prefix):
+                break
+            exact = 0 if term == prefix else 1
+            score = (exact, rank, len(term))
+            if book_id not in best or score < best[book_id][0]:
+                best[book_id] = (score, term, rank)
+
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], books[item[0]][0] or ''))[:limit]
+        kinds = {rank: kind for kind, rank in KIND_RANK.items()}
+        return [{
+            'id': book_id,
+            'title': books[book_id][0],
+            'author': books[book_id][1],
+            'match': kinds[rank],
+            'matched_term': term
+        } for book_id, (_, term, rank) in ranked]
+
+suggest_index = PrefixIndex()
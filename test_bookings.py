@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+VulnLib Booking Test
+Reserves a future loan, lets the overdue sweeper hand its copy out and
+checks that the dates after it can still be booked (run against a live server)
+"""
+
+import time
+import requests
+from datetime import datetime, timedelta
+
+BASE_URL = 'http://localhost:5000'
+
+START_DELAY = 3  # seconds until the reserved loan's period begins
+LOAN_DAYS = 7
+
+def login(username, password):
+    session = requests.Session()
+    response = session.post(f'{BASE_URL}/api/auth/login', json={'username': username, 'password': password})
+    response.raise_for_status()
+    return session
+
+def create_book(session):
+    response = session.post(f'{BASE_URL}/api/books', json={
+        'title': f'Booking Test {datetime.utcnow().isoformat()}',
+        'author': 'Booking Test',
+        'category': 'Technology',
+        'total_copies': 1,
+        'available_copies': 1
+    })
+    response.raise_for_status()
+    return response.json()['book_id']
+
+def free_copies(session, book_id, start, end):
+    response = session.get(f'{BASE_URL}/api/books/{book_id}/availability',
+                           params={'from': start.isoformat(), 'to': end.isoformat()})
+    return response.json()['free_copies']
+
+def check_reservation(session, book_id, start, end):
+    """A loan starting later is approved as a reservation without taking the copy"""
+    print("📅 Reserving a loan that starts in a few seconds...")
+    loan_id = session.post(f'{BASE_URL}/api/loans', json={
+        'book_id': book_id, 'from_date': start.isoformat(), 'to_date': end.isoformat()
+    }).json()['loan_id']
+    session.put(f'{BASE_URL}/api/loans/{loan_id}/approve', json={}).raise_for_status()
+    shelf = session.get(f'{BASE_URL}/api/books/{book_id}').json()['available_copies']
+
+    print(f"   available_copies={shelf}")
+    if shelf == 1:
+        print("✅ Reservation left the copy on the shelf")
+        return True
+    print("❌ Reservation took the copy early")
+    return False
+
+def check_booking_after_sweep(session, book_id, start, end):
+    """Once the sweeper hands the copy out, the dates after the loan stay bookable"""
+    after_start, after_end = end + timedelta(days=1), end + timedelta(days=3)
+    # Builds and caches the book's schedule before the sweep
+    before = free_copies(session, book_id, after_start, after_end)
+
+    time.sleep(max(0, (start - datetime.utcnow()).total_seconds()) + 1)
+    sweep = session.post(f'{BASE_URL}/api/admin/loans/sweep-overdue', json={}).json()['sweep']
+
+    during = free_copies(session, book_id, start + timedelta(days=1), start + timedelta(days=2))
+    after = free_copies(session, book_id, after_start, after_end)
+    booked = session.post(f'{BASE_URL}/api/loans', json={
+        'book_id': book_id, 'from_date': after_start.isoformat(), 'to_date': after_end.isoformat()
+    }).status_code
+
+    print(f"   started={sweep['reservations_started']} free before={before} during={during} after={after} booking={booked}")
+    if sweep['reservations_started'] >= 1 and before == 1 and during == 0 and after == 1 and booked == 200:
+        print("✅ Dates after the handed-out loan can be booked")
+        return True
+    print("❌ Sweep left a stale schedule behind")
+    return False
+
+def main():
+    print("🚀 Starting VulnLib Booking Test")
+    print("=" * 50)
+
+    librarian = login('librarian', 'PisangGorengYes!!')
+    book_id = create_book(librarian)
+    start = datetime.utcnow() + timedelta(seconds=START_DELAY)
+    end = start + timedelta(days=LOAN_DAYS)
+
+    passed = check_reservation(librarian, book_id, start, end)
+    print("-" * 30)
+    passed = check_booking_after_sweep(librarian, book_id, start, end) and passed
+    print("-" * 30)
+
+    print(f"\n🎯 Result: {'passed' if passed else 'FAILED'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+VulnLib Concurrency Stress Test
+Fires parallel loan approvals and returns at one book and checks that
+available_copies never drifts (run against a live server)
+"""
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BASE_URL = 'http://localhost:5000'
+
+COPIES = 5
+LOANS = 200
+WORKERS = 50
+
+def login(username, password):
+    session = requests.Session()
+    response = session.post(f'{BASE_URL}/api/auth/login', json={'username': username, 'password': password})
+    response.raise_for_status()
+    return session
+
+def create_book(session):
+    response = session.post(f'{BASE_URL}/api/books', json={
+        'title': f'Concurrency Test {datetime.utcnow().isoformat()}',
+        'author': 'Stress Test',
+        'category': 'Technology',
+        'total_copies': COPIES,
+        'available_copies': COPIES
+    })
+    response.raise_for_status()
+    return response.json()['book_id']
+
+def available_copies(book_id):
+    return requests.get(f'{BASE_URL}/api/books/{book_id}').json()['available_copies']
+
+def request_loans(session, book_id):
+    today = datetime.utcnow()
+    loan_ids = []
+    for _ in range(LOANS):
+        response = session.post(f'{BASE_URL}/api/loans', json={
+            'book_id': book_id,
+            'from_date': today.isoformat(),
+            'to_date': (today + timedelta(days=14)).isoformat()
+        })
+        response.raise_for_status()
+        loan_ids.append(response.json()['loan_id'])
+    return loan_ids
+
+def fire(method, urls):
+    """Send every request in parallel; returns (url, status code) pairs"""
+    def send(url):
+        return url, requests.request(method, url, json={}).status_code
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(send, urls))
+
+def check_parallel_approvals(book_id, loan_ids):
+    """Exactly COPIES of LOANS parallel approvals may succeed"""
+    print(f"⚡ Approving {len(loan_ids)} loans for a {COPIES}-copy book in parallel...")
+
+    results = fire('PUT', [f'{BASE_URL}/api/loans/{loan_id}/approve' for loan_id in loan_ids])
+    approved = [url.split('/')[-2] for url, status in results if status == 200]
+    conflicts = sum(1 for _, status in results if status == 409)
+    errors = len(results) - len(approved) - conflicts
+    remaining = available_copies(book_id)
+
+    print(f"   approved={len(approved)} conflicts={conflicts} errors={errors} available_copies={remaining}")
+    if len(approved) == COPIES and conflicts == len(loan_ids) - COPIES and errors == 0 and remaining == 0:
+        print("✅ No lost updates: every copy lent exactly once")
+        return approved
+    print("❌ Availability drifted under concurrent approvals")
+    return None
+
+def check_parallel_returns(book_id, approved):
+    """Returning every approved loan twice at once may only restock each copy once"""
+    print(f"⚡ Returning {len(approved)} loans twice each in parallel...")
+
+    urls = [f'{BASE_URL}/api/loans/{loan_id}/return' for loan_id in approved]
+    codes = [status for _, status in fire('PUT', urls + urls)]
+    returned = codes.count(200)
+    remaining = available_copies(book_id)
+
+    print(f"   returned={returned} conflicts={codes.count(409)} available_copies={remaining}")
+    if returned == len(approved) and remaining == COPIES:
+        print("✅ Every copy back on the shelf exactly once")
+        return True
+    print("❌ Availability drifted under concurrent returns")
+    return False
+
+def main():
+    print("🚀 Starting VulnLib Concurrency Stress Test")
+    print("=" * 50)
+
+    librarian = login('librarian', 'PisangGorengYes!!')
+    book_id = create_book(librarian)
+    loan_ids = request_loans(librarian, book_id)
+
+    approved = check_parallel_approvals(book_id, loan_ids)
+    print("-" * 30)
+    passed = approved is not None and check_parallel_returns(book_id, approved)
+    print("-" * 30)
+
+    print(f"\n🎯 Result: {'passed' if passed else 'FAILED'}")
+
+if __name__ == '__main__':
+    main()